@@ -20,7 +20,7 @@ import time
 import matplotlib.pyplot as plt
 from exphydro.distributed import ExphydroDistrParameters
 from exphydro.distributed.type1 import ExphydroDistrModel
-from hydroutils import Calibration, ObjectiveFunction
+from hydroutils import Calibration, ObjectiveFunction, ForcingData, ProgressPrinter
 
 start_time = time.time()
 
@@ -37,10 +37,11 @@ os.chdir(dir1)
 # MAIN PROGRAM
 
 # Load meteorological and observed flow data
-P = numpy.genfromtxt('SampleData/P_test.txt')  # Observed rainfall (mm/day)
-T = numpy.genfromtxt('SampleData/T_test.txt')  # Observed air temperature (deg C)
-PET = numpy.genfromtxt('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
-Qobs = numpy.genfromtxt('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
+# (the text files are converted into binary files in SampleData/.cache on the first run)
+P = ForcingData.load('SampleData/P_test.txt')  # Observed rainfall (mm/day)
+T = ForcingData.load('SampleData/T_test.txt')  # Observed air temperature (deg C)
+PET = ForcingData.load('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
+Qobs = ForcingData.load('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
 
 # Specify the number of pixels in the catchment
 npixels = 5
@@ -61,7 +62,8 @@ calperiods_obs = [365, 2557]
 calperiods_sim = [365, 2557]
 
 # Calibrate the model to identify optimal parameter set
-paramsmax = Calibration.pso_maximise(model, params, Qobs, ObjectiveFunction.klinggupta, calperiods_obs, calperiods_sim)
+paramsmax = Calibration.pso_maximise(model, params, Qobs, ObjectiveFunction.klinggupta, calperiods_obs, calperiods_sim,
+                                     callback=ProgressPrinter(every=5))
 print ('Calibration run KGE value = ', paramsmax.objval)
 
 # Run the optimised model for validation period
@@ -15,7 +15,7 @@ import numpy
 import os
 import matplotlib.pyplot as plt
 from exphydro.lumped import ExphydroModel, ExphydroParameters
-from hydroutils import Calibration, ObjectiveFunction
+from hydroutils import Calibration, ObjectiveFunction, ForcingData, ProgressPrinter
 
 ######################################################################
 # SET WORKING DIRECTORY
@@ -30,17 +30,15 @@ os.chdir(dir1)
 # MAIN PROGRAM
 
 # Load meteorological and observed flow data
-P = numpy.genfromtxt('SampleData/P_test.txt')  # Observed rainfall (mm/day)
-T = numpy.genfromtxt('SampleData/T_test.txt')  # Observed air temperature (deg C)
-PET = numpy.genfromtxt('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
-Qobs = numpy.genfromtxt('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
+# (the text files are converted into binary files in SampleData/.cache on the first run)
+P = ForcingData.load('SampleData/P_test.txt')  # Observed rainfall (mm/day)
+T = ForcingData.load('SampleData/T_test.txt')  # Observed air temperature (deg C)
+PET = ForcingData.load('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
+Qobs = ForcingData.load('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
 
 # Specify the no. of iterations
 niter = 100
 
-# Generate 'niter' initial EXP-HYDRO model parameters
-params = [ExphydroParameters() for j in range(niter)]
-
 # Initialise the model by loading its climate inputs
 model = ExphydroModel(P, PET, T)
 
@@ -50,9 +48,12 @@ model = ExphydroModel(P, PET, T)
 calperiods_obs = [365, 2557]
 calperiods_sim = [365, 2557]
 
-# Calibrate the model to identify optimal parameter set
-paramsmax = Calibration.montecarlo_maximise(model, params, Qobs, ObjectiveFunction.klinggupta,
-                                            calperiods_obs, calperiods_sim)
+# Calibrate the model to identify optimal parameter set.
+# The 'niter' random EXP-HYDRO model parameter sets are generated in chunks
+# during the calibration, and only the best parameter sets are kept.
+paramsbest = Calibration.montecarlo_stream(model, ExphydroParameters(), niter, Qobs, ObjectiveFunction.klinggupta,
+                                           calperiods_obs, calperiods_sim, callback=ProgressPrinter(every=1))
+paramsmax = paramsbest[0]
 print('Calibration run KGE value = ', paramsmax.objval)
 
 # Run the optimised model for validation period
@@ -12,7 +12,7 @@ import os
 import time
 import matplotlib.pyplot as plt
 from exphydro.lumped import ExphydroModel, ExphydroParameters
-from hydroutils import Calibration, ObjectiveFunction
+from hydroutils import Calibration, ObjectiveFunction, ForcingData, ProgressPrinter
 
 
 start_time = time.time()
@@ -30,10 +30,11 @@ os.chdir(dir1)
 # MAIN PROGRAM
 
 # Load meteorological and observed flow data
-P = numpy.genfromtxt('SampleData/P_test.txt')  # Observed rainfall (mm/day)
-T = numpy.genfromtxt('SampleData/T_test.txt')  # Observed air temperature (deg C)
-PET = numpy.genfromtxt('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
-Qobs = numpy.genfromtxt('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
+# (the text files are converted into binary files in SampleData/.cache on the first run)
+P = ForcingData.load('SampleData/P_test.txt')  # Observed rainfall (mm/day)
+T = ForcingData.load('SampleData/T_test.txt')  # Observed air temperature (deg C)
+PET = ForcingData.load('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
+Qobs = ForcingData.load('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
 
 # Specify the no. of parameter sets (particles) in a PSO swarm
 npart = 10
@@ -51,7 +52,8 @@ calperiods_obs = [365, 2557]
 calperiods_sim = [365, 2557]
 
 # Calibrate the model to identify optimal parameter set
-paramsmax = Calibration.pso_maximise(model, params, Qobs, ObjectiveFunction.klinggupta, calperiods_obs, calperiods_sim)
+paramsmax = Calibration.pso_maximise(model, params, Qobs, ObjectiveFunction.klinggupta, calperiods_obs, calperiods_sim,
+                                     callback=ProgressPrinter(every=5))
 print('Calibration run KGE value = ', paramsmax.objval)
 
 # Run the optimised model for validation period
@@ -11,7 +11,7 @@ import numpy
 import os
 import matplotlib.pyplot as plt
 from exphydro.lumped import ExphydroModel, ExphydroParameters
-from hydroutils import ObjectiveFunction
+from hydroutils import ObjectiveFunction, ForcingData
 
 ######################################################################
 # SET WORKING DIRECTORY
@@ -26,10 +26,11 @@ os.chdir(dir1)
 # MAIN PROGRAM
 
 # Load meteorological and observed flow data
-P = numpy.genfromtxt('SampleData/P_test.txt')  # Observed rainfall (mm/day)
-T = numpy.genfromtxt('SampleData/T_test.txt')  # Observed air temperature (deg C)
-PET = numpy.genfromtxt('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
-Qobs = numpy.genfromtxt('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
+# (the text files are converted into binary files in SampleData/.cache on the first run)
+P = ForcingData.load('SampleData/P_test.txt')  # Observed rainfall (mm/day)
+T = ForcingData.load('SampleData/T_test.txt')  # Observed air temperature (deg C)
+PET = ForcingData.load('SampleData/PET_test.txt')  # Potential evapotranspiration (mm/day)
+Qobs = ForcingData.load('SampleData/Q_test.txt')  # Observed streamflow (mm/day)
 
 # Initialise EXP-HYDRO model parameters object
 params = ExphydroParameters()
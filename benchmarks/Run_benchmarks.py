@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" BENCHMARK SUITE
+Run this file to measure the speed of the main computations of the
+EXP-HYDRO model and the hydroutils package, and to compare them with a
+saved baseline.
+
+Usage:
+    python Run_benchmarks.py run [--quick] [--output results.json]
+    python Run_benchmarks.py compare baseline.json results.json [--tolerance 0.2]
+
+The 'run' command writes the results to a JSON file.  For each benchmark it
+contains the shortest and median run time (seconds) over a few repeats, the
+throughput (e.g., simulated days or evaluations per second), and the peak
+memory allocated during one run (bytes, measured with tracemalloc in a
+separate run so that it does not slow the timed runs).
+
+The 'compare' command prints the change in run time of each benchmark and
+exits with status 1 if a benchmark is slower than the baseline by more than
+the tolerance (e.g., 0.2 means 20 %).
+
+The benchmarks use synthetic climate inputs (generated with a fixed seed)
+and the data in the SampleData folder, so their results are reproducible.
+"""
+
+import numpy
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import subprocess
+import scipy
+
+# Make the packages of this repository importable without installing them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exphydro.lumped import ExphydroModel, ExphydroParameters
+from exphydro.distributed import ExphydroDistrParameters
+from exphydro.distributed import type1, type2, type3, type4
+from hydroutils import Calibration, ObjectiveFunction, OdeSolver, Daily2monthly, ForcingData, Profiler
+
+######################################################################
+# CLIMATE INPUTS
+
+
+def synthetic_inputs(ndays, npixels=None, seed=42):
+
+    """ This function returns synthetic daily precipitation, potential evapotranspiration and
+    air temperature time-series with a seasonal cycle.  If npixels is given, each time-series
+    is a (ndays, npixels) matrix whose columns differ slightly from each other.
+    """
+
+    rng = numpy.random.default_rng(seed)
+    shape = (ndays,) if npixels is None else (ndays, npixels)
+    season = numpy.sin(2*numpy.pi*numpy.arange(ndays)/365.25)
+    if npixels is not None:
+        season = season[:, numpy.newaxis]
+
+    p = rng.gamma(0.4, 8.0, size=shape)*(rng.random(shape) < 0.5)
+    t = 8.0 + 12.0*season + rng.normal(0.0, 3.0, size=shape)
+    pet = numpy.maximum(0.0, 2.0 + 1.8*season + rng.normal(0.0, 0.3, size=shape))
+
+    return p, pet, t
+
+
+def sample_inputs():
+
+    """ This function returns the climate inputs and observed streamflow in the SampleData folder."""
+
+    datadir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SampleData')
+
+    p = ForcingData.load(os.path.join(datadir, 'P_test.txt'), mmap_mode=None)
+    t = ForcingData.load(os.path.join(datadir, 'T_test.txt'), mmap_mode=None)
+    pet = ForcingData.load(os.path.join(datadir, 'PET_test.txt'), mmap_mode=None)
+    qobs = ForcingData.load(os.path.join(datadir, 'Q_test.txt'), mmap_mode=None)
+
+    return p, pet, t, qobs
+
+######################################################################
+# MEASUREMENT
+
+
+def measure(function, repeat, units=0):
+
+    """ This function runs a benchmark and returns its results.
+
+    Args:
+        (1) function: Function without arguments that runs the benchmark once.
+        (2) repeat: No. of timed runs.
+        (3) units: (Optional) No. of units (e.g., simulated days) processed in one run, to
+                   calculate the throughput.  If function returns a number, it is used instead.
+    """
+
+    function()  # Warm-up run (e.g., for caches of the operating system)
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    if isinstance(result, (int, float)):
+        units = result
+
+    # Peak memory is measured in a separate run, because tracemalloc slows down the code
+    tracemalloc.start()
+    function()
+    peakmem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tmin = min(times)
+    return {'time': tmin, 'median': float(numpy.median(times)), 'repeat': repeat,
+            'throughput': units/tmin if units else None, 'peakmem': peakmem}
+
+
+def metadata():
+
+    """ This function returns a description of the software and computer used for the benchmarks."""
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'numpy': numpy.__version__, 'scipy': scipy.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+######################################################################
+# BENCHMARKS
+
+
+def benchmarks(quick=False):
+
+    """ This function returns the benchmarks as a list of (name, function, units) tuples.
+    With quick=True, fewer and smaller benchmarks are run.
+    """
+
+    bench = []
+    para = ExphydroParameters()
+    para.setvalues([0.02, 1200.0, 25.0, 2.5, -1.0, 1.0])
+
+    # Lumped model over time-series of different lengths
+    for nyears in ((1, 10) if quick else (1, 10, 100)):
+        ndays = 365*nyears
+        model = ExphydroModel(*synthetic_inputs(ndays))
+        bench.append(('lumped_simulate_%dy' % nyears, lambda model=model: model.simulate(para), ndays))
+
+    # ODE solvers over 10 years
+    ndays = 3650
+    for solver in ('rk4', 'rk45', 'rk4_kernel'):
+        model = ExphydroModel(*synthetic_inputs(ndays), solver=solver)
+        bench.append(('lumped_solver_%s' % solver, lambda model=model: model.simulate(para), ndays))
+    model = ExphydroModel(*synthetic_inputs(ndays))
+    bench.append(('odesolver_solve_rk4', lambda model=model: OdeSolver.solve_rk4(model.waterbalance, model.storage,
+                                                                                 para, ndays), ndays))
+    bench.append(('odesolver_solve_rk45', lambda model=model: OdeSolver.solve_rk45(model.waterbalance, model.storage,
+                                                                                   para, ndays), ndays))
+
+    # Batch of parameter sets
+    nsets = 100 if quick else 1000
+    model = ExphydroModel(*synthetic_inputs(ndays))
+    numpy.random.seed(1)
+    param_matrix = numpy.array([ExphydroParameters().getvalues() for i in range(nsets)])
+    bench.append(('lumped_simulate_batch_%d' % nsets, lambda model=model: model.simulate_batch(param_matrix),
+                  nsets*ndays))
+
+    # Distributed models with different numbers of pixels (or sub-catchments)
+    for npixels in ((10, 100) if quick else (10, 100, 1000)):
+        p1, pet1, t1 = synthetic_inputs(ndays)
+        p2, pet2, t2 = synthetic_inputs(ndays, npixels)
+        weights = numpy.full(npixels, 1.0/npixels)
+        models = {'type1': type1.ExphydroDistrModel(p1, pet1, t1, npixels),
+                  'type2': type2.ExphydroDistrModel(p2, pet2, t2, npixels),
+                  'type3': type3.ExphydroDistrModel(p1, pet1, t1, npixels, weights),
+                  'type4': type4.ExphydroDistrModel(p2, pet2, t2, npixels, weights)}
+        numpy.random.seed(2)
+        distpara = ExphydroDistrParameters(npixels)
+        for name, model in models.items():
+            bench.append(('distributed_%s_%dpixels' % (name, npixels),
+                          lambda model=model, para=distpara: model.simulate(para), npixels*ndays))
+
+    # Calibration throughput (evaluations per second) with the sample data
+    p, pet, t, qobs = sample_inputs()
+    calperiods = [365, 2557]
+
+    def pso(npart=10):
+        numpy.random.seed(3)
+        params = [ExphydroParameters() for i in range(npart)]
+        profiler = Profiler()
+        Calibration.pso_maximise(ExphydroModel(p, pet, t), params, qobs, ObjectiveFunction.klinggupta,
+                                 calperiods, calperiods, callback=profiler)
+        return profiler.progress['nevals']
+    bench.append(('calibration_pso_maximise', pso, 0))
+
+    def montecarlo(niter=20 if quick else 100, batchsize=None):
+        numpy.random.seed(4)
+        params = [ExphydroParameters() for i in range(niter)]
+        Calibration.montecarlo_maximise(ExphydroModel(p, pet, t), params, qobs, ObjectiveFunction.klinggupta,
+                                        calperiods, calperiods, batchsize=batchsize, callback=None)
+        return niter
+    bench.append(('calibration_montecarlo_maximise', montecarlo, 0))
+    bench.append(('calibration_montecarlo_maximise_batch',
+                  lambda: montecarlo(1000 if quick else 10000, batchsize=1000), 0))
+
+    # Aggregation of daily data of many pixels
+    npixels = 100 if quick else 1000
+    dailydata = synthetic_inputs(36525, npixels)[0]
+    for freq in ('monthly', 'annual'):
+        bench.append(('daily2monthly_%s_%dpixels' % (freq, npixels),
+                      lambda freq=freq: Daily2monthly.aggregate(dailydata, 1950, 1, 1, freq=freq), dailydata.size))
+
+    return bench
+
+######################################################################
+# COMMANDS
+
+
+def run(output, quick=False, repeat=3, select=None):
+
+    """ This function runs the benchmarks and writes the results to a JSON file."""
+
+    results = {}
+    for name, function, units in benchmarks(quick):
+        if select is not None and select not in name:
+            continue
+        results[name] = measure(function, repeat, units)
+        print('%-45s %10.4g s  (peak memory %.3g MB)' % (name, results[name]['time'], results[name]['peakmem']/1e6))
+
+    with open(output, 'w') as fout:
+        json.dump({'metadata': metadata(), 'results': results}, fout, indent=1)
+    print('Results written to', output)
+
+
+def compare(baseline, current, tolerance=0.2):
+
+    """ This function compares the run times of two result files and returns
+    the names of the benchmarks that are slower than the baseline by more than the tolerance.
+    """
+
+    with open(baseline) as fin:
+        base = json.load(fin)['results']
+    with open(current) as fin:
+        curr = json.load(fin)['results']
+
+    regressions = []
+    print('%-45s %12s %12s %8s' % ('Benchmark', 'Baseline (s)', 'Current (s)', 'Change'))
+    for name in sorted(set(base) & set(curr)):
+        change = curr[name]['time']/base[name]['time'] - 1.0
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  SLOWER'
+        print('%-45s %12.4g %12.4g %+7.1f%%%s' % (name, base[name]['time'], curr[name]['time'], 100*change, flag))
+
+    for name in sorted(set(base) ^ set(curr)):
+        print('%-45s only in %s' % (name, 'baseline' if name in base else 'current results'))
+
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Benchmarks of EXP-HYDRO and hydroutils')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runparser = commands.add_parser('run', help='run the benchmarks')
+    runparser.add_argument('--output', default='benchmark_results.json', help='JSON file of the results')
+    runparser.add_argument('--quick', action='store_true', help='run fewer and smaller benchmarks')
+    runparser.add_argument('--repeat', type=int, default=3, help='no. of timed runs of each benchmark')
+    runparser.add_argument('--select', help='only run the benchmarks whose name contains this text')
+
+    compareparser = commands.add_parser('compare', help='compare results with a baseline')
+    compareparser.add_argument('baseline', help='JSON file of the baseline results')
+    compareparser.add_argument('current', help='JSON file of the current results')
+    compareparser.add_argument('--tolerance', type=float, default=0.2,
+                               help='allowed relative increase of the run time (default 0.2)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        run(args.output, args.quick, args.repeat, args.select)
+        return 0
+
+    regressions = compare(args.baseline, args.current, args.tolerance)
+    if regressions:
+        print(len(regressions), 'benchmark(s) slower than the baseline:', ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+######################################################################
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'exphydro.distributed' package.
+
+import numpy
+from scipy import sparse
+from exphydro.lumped import ExphydroModel
+
+
+######################################################################
+
+class ExphydroDistrEngine(object):
+
+    """ The 'ExphydroDistrEngine' class simulates all pixels (or sub-catchments)
+    of a distributed EXP-HYDRO model together.
+
+    The storage of all pixels is held as one (npixels, 2) array and the pixels are
+    integrated in one pass over the time-series (see ExphydroModel.simulate_batch).
+    The streamflow at the catchment outlet is the weighted sum of the streamflow
+    of all pixels.  It is the base class of the ExphydroDistrModel classes of
+    type 1 to type 4.
+
+    Pixels that receive the same climate inputs (type 1 and type 3 models) and have the
+    same parameter values form one hydrologic response unit (HRU), which is simulated
+    only once (see the responseunits method).
+
+    For very large grids, the pixels can instead be simulated in chunks of pixels
+    (chunked mode).  Only the climate inputs of one chunk are then read into memory
+    at a time (e.g., from memory-mapped arrays, see hydroutils.ForcingData), and only
+    the combined streamflow and a summary of the streamflow of each pixel are kept.
+
+    If only the combined streamflow is needed (e.g., during calibration), the streamflow of
+    the pixels need not be kept (low-memory mode, see ExphydroModel.simulate_weighted).
+    The memory needed then grows with the length of the time-series, not with the no. of
+    pixels times the length of the time-series.  All pixels share one reference to the
+    climate inputs, which are not copied.
+
+    Instead of the streamflow at the catchment outlet, the streamflow at several gauges
+    (e.g., nested gauges inside the catchment) can be simulated.  The weights of the pixels
+    are then a sparse routing matrix with one row per gauge, which is applied to the
+    streamflow of all pixels in one matrix product.
+    """
+
+    # Arrays that are only read (or replaced) by a simulation, which worker processes
+    # can use from shared memory (see hydroutils.SharedArrays)
+    sharedattributes = ('weights', 'qsim', 'qsimpixels')
+
+    def __init__(self, p, pet, t, weights, chunksize=None, keeppixels=True, dtype=None):
+
+        """ This method is used to initialise, i.e., create an instance of the ExphydroDistrEngine class.
+
+        Syntax: ExphydroDistrEngine(p, pet, t, weights, chunksize, keeppixels, dtype)
+
+        Args:
+            (1) p: Daily precipitation time-series (mm/day)
+            (2) pet: Daily potential evapotranspiration time-series (mm/day)
+            (3) t: Daily mean air temperature time-series (deg C)
+            (4) weights: Relative weight of all pixels (array) in the outlet streamflow, or a
+                         (ngauges, npixels) matrix (e.g., a scipy.sparse matrix) of the relative
+                         weight of all pixels in the streamflow at each gauge.
+            (5) chunksize: (Optional) No. of pixels simulated together in chunked mode.
+                           By default all pixels are simulated together.
+            (6) keeppixels: (Optional) If False, the streamflow of each pixel is not kept (low-memory mode).
+            (7) dtype: (Optional) Floating point type of the storage and streamflow of the pixels, e.g.,
+                       numpy.float32 to halve the memory needed. By default it is float64.
+
+        The climate inputs are either one time-series shared by all pixels, or a matrix
+        in which each column is the time-series of one pixel.  The climate inputs are not copied,
+        so they can be memory-mapped arrays (see hydroutils.ForcingData).
+
+        """
+
+        # One lumped EXP-HYDRO model simulates all pixels
+        self.model = ExphydroModel(p, pet, t)
+
+        if sparse.issparse(weights) or numpy.ndim(weights) == 2:
+            self.weights = sparse.csr_matrix(weights, dtype=float)  # Routing matrix of the gauges
+        else:
+            self.weights = numpy.asarray(weights, dtype=float)  # Relative weight of each pixel
+        self.timespan = p.shape[0]  # Time length of the simulation period
+        # Simulated streamflow (mm/day), with one column per gauge if there is a routing matrix
+        self.qsim = numpy.zeros((self.timespan,) + self.weights.shape[:-1])
+        self.para = None  # Parameter set of the last simulation
+
+        self.chunksize = chunksize  # No. of pixels in each chunk (chunked mode)
+        self.keeppixels = keeppixels  # Whether the streamflow of each pixel is kept
+        self.dtype = dtype  # Floating point type of the storage and streamflow of the pixels
+        if chunksize is None and keeppixels:
+            self.qsimpixels = numpy.zeros((self.weights.shape[-1], self.timespan))  # Streamflow of each pixel (mm/day)
+        else:
+            self.qsimpixels = None  # Not kept in chunked and low-memory modes
+        self.pixelsummary = None  # Mean and maximum streamflow of each pixel (chunked mode)
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def averageweights(npixels):
+
+        """ This method returns the pixel weights of the type 1 and type 2 models.
+
+        These models combine the pixels one after the other as the average of
+        the streamflow of the pixels so far and the streamflow of the next pixel.
+        The weights below give exactly the same combined streamflow.
+        """
+
+        weights = 0.5**(npixels - numpy.arange(npixels, dtype=float))
+        weights[0] = 0.5**(npixels - 1)
+
+        return weights
+
+    # ----------------------------------------------------------------
+
+    def simulate(self, para, tend=None):
+
+        """ This method simulates the EXP-HYDRO model over all pixels
+        and provides a combined streamflow output.  With a routing matrix (see the
+        __init__ method), it is a (days, ngauges) array of the streamflow at each gauge.
+
+        Args:
+            (1) para: Parameter set of all pixels (instance of ExphydroDistrParameters)
+            (2) tend: (Optional) Index of the last day that is needed from the simulation
+                      (see ExphydroModel.simulate).
+        """
+
+        self.para = para
+        param_matrix = para.getmatrix()
+        hrus = self.responseunits(param_matrix)
+
+        if self.chunksize is not None:
+            if hrus is None:
+                self.qsim = self.simulate_chunks(param_matrix, self.weights, tend)
+            else:
+                self.qsim = self.simulate_chunks(param_matrix[hrus[0]], hrus[2], tend)
+                self.pixelsummary = {key: value[hrus[1]] for key, value in self.pixelsummary.items()}
+            return self.qsim
+
+        if not self.keeppixels:
+            # Only the combined streamflow is calculated (low-memory mode)
+            if hrus is None:
+                self.qsim = self.model.simulate_weighted(param_matrix, self.weights, tend=tend, dtype=self.dtype).T
+            else:
+                self.qsim = self.model.simulate_weighted(param_matrix[hrus[0]], hrus[2], tend=tend,
+                                                         dtype=self.dtype).T
+                self.expandunits(param_matrix, hrus, self.model.qsimbatch)
+            return self.qsim
+
+        if hrus is None:
+            self.qsimpixels = self.model.simulate_batch(param_matrix, tend=tend, dtype=self.dtype)
+
+            # Weight-based combination of the Q output of all pixels
+            self.qsim = self.weights.dot(self.qsimpixels).T
+        else:
+            qsimhrus = self.model.simulate_batch(param_matrix[hrus[0]], tend=tend, dtype=self.dtype)
+
+            # Weight-based combination of the Q output of all HRUs
+            self.qsim = hrus[2].dot(qsimhrus).T
+            self.qsimpixels = self.expandunits(param_matrix, hrus, qsimhrus)
+
+        return self.qsim
+
+    # ----------------------------------------------------------------
+
+    def responseunits(self, param_matrix):
+
+        """ This method groups the pixels that receive the same climate inputs and have
+        the same parameter values into hydrologic response units (HRUs).
+
+        Args:
+            (1) param_matrix: (npixels, 6) array of the parameter values of all pixels.
+
+        Returns the index values of one pixel of each HRU, the HRU of each pixel, and the
+        total weight of the pixels of each HRU.  Returns None if no pixels can be grouped,
+        i.e., if each pixel has its own climate inputs, or if each pixel has its own
+        initial storage (see setstate).
+        """
+
+        if self.model.P.ndim != 1 or numpy.ndim(self.model.storage) != 1:
+            return None
+
+        _, first, hruindex = numpy.unique(param_matrix, axis=0, return_index=True, return_inverse=True)
+        if first.shape[0] == param_matrix.shape[0]:
+            return None
+
+        hruindex = hruindex.ravel()
+        if sparse.issparse(self.weights):
+            # Routing matrix of the HRUs
+            npixels = hruindex.shape[0]
+            members = sparse.csr_matrix((numpy.ones(npixels), (numpy.arange(npixels), hruindex)),
+                                        shape=(npixels, first.shape[0]))
+            hruweights = self.weights.dot(members)
+        else:
+            hruweights = numpy.bincount(hruindex, weights=self.weights, minlength=first.shape[0])
+
+        return first, hruindex, hruweights
+
+    # ----------------------------------------------------------------
+
+    def expandunits(self, param_matrix, hrus, qsimhrus):
+
+        """ This method returns the streamflow of each pixel from the streamflow of the
+        HRUs (see the responseunits method).  The last simulation of the lumped model is
+        also expanded to all pixels, so that its state can be exported or continued.
+        """
+
+        self.model.para = param_matrix
+        self.model.laststorage = self.model.laststorage[hrus[1]]
+        self.model.qsimbatch = self.model.qsimbatch[hrus[1]]
+
+        return self.model.qsimbatch[:, :qsimhrus.shape[1]]
+
+    # ----------------------------------------------------------------
+
+    def chunkmodel(self, pixels):
+
+        """ This method returns the lumped EXP-HYDRO model that simulates a chunk of pixels.
+
+        Args:
+            (1) pixels: Slice of the pixels in the chunk.
+        """
+
+        if self.model.P.ndim == 1:
+            # All pixels receive the same climate inputs
+            return self.model
+
+        # Only the climate inputs of the chunk are read into memory
+        model = ExphydroModel(numpy.ascontiguousarray(self.model.P[:, pixels]),
+                              numpy.ascontiguousarray(self.model.PET[:, pixels]),
+                              numpy.ascontiguousarray(self.model.T[:, pixels]))
+        model.day0 = self.model.day0
+
+        return model
+
+    # ----------------------------------------------------------------
+
+    def simulate_chunks(self, param_matrix, weights, tend=None):
+
+        """ This method simulates the pixels in chunks and adds up the weighted
+        streamflow of each chunk (chunked mode).
+
+        Args:
+            (1) param_matrix: (npixels, 6) array of the parameter values of all pixels (or HRUs).
+            (2) weights: Relative weight of all pixels (or HRUs), or their routing matrix.
+            (3) tend: (Optional) See the simulate method.
+
+        Returns the combined streamflow.  The mean and maximum streamflow of each
+        pixel are stored in the 'pixelsummary' dictionary.
+        """
+
+        npixels = weights.shape[-1]
+        qmean = numpy.zeros(npixels)
+        qmax = numpy.zeros(npixels)
+        qsim = None
+
+        for k in range(0, npixels, self.chunksize):
+            pixels = slice(k, k + self.chunksize)
+
+            qsimchunk = self.chunkmodel(pixels).simulate_batch(param_matrix[pixels], tend=tend, dtype=self.dtype)
+
+            # Weighted streamflow of the chunk at the catchment outlet (or at each gauge)
+            qchunk = weights[..., pixels].dot(qsimchunk).T
+            qsim = qchunk if qsim is None else qsim + qchunk
+
+            qmean[pixels] = numpy.mean(qsimchunk, axis=1)
+            qmax[pixels] = numpy.max(qsimchunk, axis=1)
+
+        self.pixelsummary = {'qmean': qmean, 'qmax': qmax}
+
+        return qsim
+
+    # ----------------------------------------------------------------
+
+    def checkchunked(self):
+
+        """ This method raises a ValueError in chunked mode, in which the states
+        of the pixels are not kept.
+        """
+
+        if self.chunksize is not None:
+            raise ValueError('The states of the pixels are not kept in chunked mode')
+
+    # ----------------------------------------------------------------
+
+    def getstate(self):
+
+        """ This method exports the state of all pixels on the last simulated day,
+        so that the simulation can later be continued from it (see ExphydroModel.getstate).
+        The storage of the state has one row per pixel.  It is not available in chunked mode.
+        """
+
+        self.checkchunked()
+        return self.model.getstate()
+
+    # ----------------------------------------------------------------
+
+    def setstate(self, state):
+
+        """ This method imports a state that was exported with getstate.
+        The simulation period of the model becomes the single day of the state.
+        It is not available in chunked mode.
+        """
+
+        self.checkchunked()
+        self.model.setstate(state)
+
+        self.timespan = 1
+        self.qsim = self.weights.dot(self.model.qsimbatch).T
+        if self.keeppixels:
+            self.qsimpixels = self.model.qsimbatch.copy()
+
+    # ----------------------------------------------------------------
+
+    def advance(self, p, pet, t, para=None):
+
+        """ This method continues the simulation from the last simulated day (or from
+        a state imported with setstate) over new days of climate inputs.  The results
+        are the same as those of a simulation over the entire time-series.  The fluxes
+        of the last day are recalculated in the next call, because they depend on the
+        climate inputs of the next day (see ExphydroModel.appendinputs).
+
+        Args:
+            (1) p: Daily precipitation of the new days (mm/day)
+            (2) pet: Daily potential evapotranspiration of the new days (mm/day)
+            (3) t: Daily mean air temperature of the new days (deg C)
+            (4) para: (Optional) Parameter set of all pixels. By default it is the parameter set of the last simulation.
+
+        The climate inputs have the same layout as those given to initialise the model.
+        Returns the combined streamflow of the new days (mm/day).
+        """
+
+        self.checkchunked()
+
+        if para is None:
+            para = self.para
+        if para is None:
+            raise ValueError('A parameter set is needed, because the model has not been simulated yet')
+
+        if self.model.P.ndim == 2:
+            # Each pixel receives the climate inputs from its own column
+            npixels = self.weights.shape[-1]
+            p, pet, t = p[:, :npixels], pet[:, :npixels], t[:, :npixels]
+
+        self.model.appendinputs(p, pet, t)
+        self.timespan = self.model.timespan
+
+        return self.simulate(para)[1:]
+
+######################################################################
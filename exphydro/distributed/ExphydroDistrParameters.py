@@ -3,6 +3,7 @@
 # Programmer(s): Sopan Patil.
 # This file is part of the 'exphydro.distributed.type1' package.
 
+import numpy
 from exphydro.lumped import ExphydroParameters
 
 
@@ -26,6 +27,75 @@ class ExphydroDistrParameters(object):
 
     # ----------------------------------------------------------------
 
+    def getvalues(self):
+
+        """ This method returns the parameter values of all pixels as one array.
+        The six parameter values of the first pixel come first, followed by
+        those of the second pixel, and so on.
+        """
+
+        return numpy.concatenate([self.params[i].getvalues() for i in range(self.pixels)])
+
+    # ----------------------------------------------------------------
+
+    def getmatrix(self):
+
+        """ This method returns the parameter values as an (npixels, 6) array.
+        Each row contains the parameter values of one pixel.
+        """
+
+        return self.getvalues().reshape(self.pixels, -1)
+
+    # ----------------------------------------------------------------
+
+    def setvalues(self, values):
+
+        """ This method assigns the parameter values of all pixels from an array,
+        given in the same order as returned by getvalues.
+        """
+
+        values = numpy.reshape(values, (self.pixels, -1))
+        for i in range(self.pixels):
+            self.params[i].setvalues(values[i])
+
+    # ----------------------------------------------------------------
+
+    def getvelocities(self):
+
+        """ This method returns the parameter velocities of all pixels as one array,
+        in the same order as returned by getvalues.
+        """
+
+        return numpy.concatenate([self.params[i].getvelocities() for i in range(self.pixels)])
+
+    # ----------------------------------------------------------------
+
+    def setvelocities(self, velocities):
+
+        """ This method assigns the parameter velocities of all pixels from an array,
+        given in the same order as returned by getvalues.
+        """
+
+        velocities = numpy.reshape(velocities, (self.pixels, -1))
+        for i in range(self.pixels):
+            self.params[i].setvelocities(velocities[i])
+
+    # ----------------------------------------------------------------
+
+    def getbounds(self):
+
+        """ This method returns the lower and upper bounds of the parameters of
+        all pixels as two arrays, in the same order as returned by getvalues.
+        """
+
+        bounds = [self.params[i].getbounds() for i in range(self.pixels)]
+        lb = numpy.concatenate([b[0] for b in bounds])
+        ub = numpy.concatenate([b[1] for b in bounds])
+
+        return lb, ub
+
+    # ----------------------------------------------------------------
+
     def updateparameters(self, para1, para2, w):
 
         """ This function is used for PSO algorithm.
@@ -4,3 +4,4 @@
 # This file is part of the 'exphydro.distributed' package.
 
 from .ExphydroDistrParameters import ExphydroDistrParameters
+from .ExphydroDistrEngine import ExphydroDistrEngine
@@ -3,15 +3,14 @@
 # Programmer(s): Sopan Patil.
 # This file is part of the 'exphydro.distributed.type2' package.
 
-import numpy
-from exphydro.lumped import ExphydroModel
+from exphydro.distributed import ExphydroDistrEngine
 
 ######################################################################
 
 
-class ExphydroDistrModel(object):
+class ExphydroDistrModel(ExphydroDistrEngine):
 
-    def __init__(self, p, pet, t, npixels):
+    def __init__(self, p, pet, t, npixels, chunksize=None, keeppixels=True, dtype=None):
 
         """ This method is used to initialise, i.e., create an instance of the ExphydroDistrModel class.
 
@@ -22,37 +21,17 @@ class ExphydroDistrModel(object):
             (2) pet: Daily potential evapotranspiration time-series (mm/day). Each column in 1 pixel
             (3) t: Daily mean air temperature time-series (deg C). Each column is 1 pixel
             (4) npixels: Number of pixels in the catchment
+            (5) chunksize: (Optional) No. of pixels simulated together in chunked mode
+            (see ExphydroDistrEngine)
+            (6) keeppixels: (Optional) If False, the streamflow of each pixel is not kept (low-memory mode)
+            (7) dtype: (Optional) Floating point type of the storage and streamflow of the pixels
+            (see ExphydroDistrEngine)
 
         """
 
-        # The statement below creates npixel instances of the lumped EXP-HYDRO model
-        self.model = [ExphydroModel(p[:, j], pet[:, j], t[:, j]) for j in range(npixels)]
-
-        self.timespan = p.shape[0]  # Time length of the simulation period
-        self.qsimtmp = numpy.zeros(self.timespan)  # Variable to temporarily store pixel's streamflow output
-        self.qsim = numpy.zeros(self.timespan)  # Simulated streamflow (mm/day)
-
-    # ----------------------------------------------------------------
-
-    def simulate(self, para):
-
-        """ This method simulates the EXP-HYDRO model over all pixels
-        and provides a combined streamflow output.
-        """
-
-        npixels = para.pixels
-
-        # In the for loop below, each instance of lumped EXP-HYDRO model
-        # is run npixel times.
-        for i in range(npixels):
-            self.qsimtmp = self.model[i].simulate(para.params[i])
-
-            # Averaging the Q output of all pixels
-            if i == 0:
-                self.qsim = self.qsimtmp
-            else:
-                self.qsim = (self.qsim + self.qsimtmp)*0.5
-
-        return self.qsim
+        # Each pixel receives the climate inputs from its own column
+        ExphydroDistrEngine.__init__(self, p[:, :npixels], pet[:, :npixels], t[:, :npixels],
+                                     ExphydroDistrEngine.averageweights(npixels), chunksize,
+                                     keeppixels, dtype)
 
 ######################################################################
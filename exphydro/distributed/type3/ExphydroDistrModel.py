@@ -3,15 +3,16 @@
 # Programmer(s): Sopan Patil.
 # This file is part of the 'exphydro.distributed.type3' package.
 
-import numpy
-from exphydro.lumped import ExphydroModel
+from scipy import sparse
+from exphydro.distributed import ExphydroDistrEngine
 
 ######################################################################
 
 
-class ExphydroDistrModel(object):
+class ExphydroDistrModel(ExphydroDistrEngine):
 
-    def __init__(self, p, pet, t, nsubcats, subcatwts):
+    def __init__(self, p, pet, t, nsubcats, subcatwts, chunksize=None, keeppixels=True, dtype=None,
+                 gaugewts=None):
 
         """ This method is used to initialise, i.e., create an instance of the ExphydroDistrModel class.
 
@@ -24,38 +25,24 @@ class ExphydroDistrModel(object):
             (4) nsubcats: Number of sub-catchments in the catchment
             (5) Relative weight of all sub-catchments (array). It is the proportion of area
             covered by each sub-catchment.  Sum of all array elements is 1.
+            (6) chunksize: (Optional) No. of pixels simulated together in chunked mode
+            (see ExphydroDistrEngine)
+            (7) keeppixels: (Optional) If False, the streamflow of each pixel is not kept (low-memory mode)
+            (8) dtype: (Optional) Floating point type of the storage and streamflow of the pixels
+            (see ExphydroDistrEngine)
+            (9) gaugewts: (Optional) Relative weight of all sub-catchments in the streamflow at each
+            gauge, as an (ngauges, nsubcats) matrix (e.g., a scipy.sparse matrix).  If it is given,
+            the streamflow at all gauges is simulated instead of the outlet streamflow.
 
         """
 
-        # The statement below creates nsubcats instances of the lumped EXP-HYDRO model
-        self.model = [ExphydroModel(p, pet, t) for j in range(nsubcats)]
+        # Sub-catchment flows are combined at the outlet, or at each gauge in one sparse product
+        weights = subcatwts[:nsubcats] if gaugewts is None else sparse.csr_matrix(gaugewts)[:, :nsubcats]
 
-        self.subcatwts = subcatwts  # Relative weight of each sub-catchment
-        self.timespan = p.shape[0]  # Time length of the simulation period
-        self.qsimtmp = numpy.zeros(self.timespan)  # Variable to temporarily store pixel's streamflow output
-        self.qsim = numpy.zeros(self.timespan)  # Simulated streamflow (mm/day)
-
-    # ----------------------------------------------------------------
-
-    def simulate(self, para):
-
-        """ This method simulates the EXP-HYDRO model over all sub-catchments
-        and provides a combined streamflow output.
-        """
+        # All sub-catchments receive the same climate inputs
+        ExphydroDistrEngine.__init__(self, p, pet, t, weights, chunksize, keeppixels, dtype)
 
-        nsubcats = para.pixels
-
-        # In the for loop below, each instance of lumped EXP-HYDRO model
-        # is run nsubcats times.
-        for i in range(nsubcats):
-            self.qsimtmp = self.model[i].simulate(para.params[i])
-
-            # Weight-based averaging the Q output of all sub-catchments
-            if i == 0:
-                self.qsim = self.subcatwts[i]*self.qsimtmp
-            else:
-                self.qsim = self.qsim + self.subcatwts[i]*self.qsimtmp
-
-        return self.qsim
+        self.subcatwts = subcatwts  # Relative weight of each sub-catchment
+        self.gaugewts = gaugewts  # Relative weight of each sub-catchment at each gauge
 
 ######################################################################
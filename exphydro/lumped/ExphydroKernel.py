@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'exphydro.lumped' package.
+
+""" Compiled Runge-Kutta 4th order kernel for the EXP-HYDRO model.
+
+The kernel integrates the EXP-HYDRO equations over the whole time-series
+from plain float arrays and a parameter vector (f, smax, qmax, ddf, mint, maxt),
+and writes the fluxes into preallocated output arrays.  It follows exactly
+the same time stepping as OdeSolver.solve_rk4 together with the waterbalance
+method of ExphydroModel, so both give identical results.
+
+If Numba (http://numba.pydata.org/) is installed, the kernel is compiled to
+machine code.  Numba is an optional dependency (the 'numba' extra of setup.py).
+Without it, the njit decorator does nothing and the kernel runs as interpreted
+Python on scalar floats (NumPy is not used inside the time loop), which is
+still faster than the 'rk4' solver of ExphydroModel but many times slower than
+the compiled kernel.  The compiled kernel uses the exponential function of the system maths library,
+which can differ from NumPy in the last digit, so results can then differ from
+OdeSolver.solve_rk4 at the level of floating point round-off.
+"""
+
+import numpy
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+
+        """ Fallback decorator used when Numba is not installed."""
+
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+######################################################################
+
+@njit(cache=True)
+def _rhs(p, te, pet, snow, soil, f, smax, qmax, ddf, mint, maxt):
+
+    """ Right hand side of the EXP-HYDRO dS/dt equations for one time step.
+
+    Returns the two storage derivatives followed by streamflow, ET and snowmelt.
+    """
+
+    # Partitioning precipitation into rain and snow
+    if te < mint:
+        ps = p
+        pr = 0.0
+    else:
+        ps = 0.0
+        pr = p
+
+    # Snow bucket
+    m = 0.0
+    if te > maxt and snow > 0:
+        m = min(snow, ddf*(te - maxt))
+
+    # Soil bucket
+    if soil < 0:
+        et = 0.0
+        qsub = 0.0
+        qsurf = 0.0
+    elif soil > smax:
+        et = pet
+        qsub = qmax
+        qsurf = soil - smax
+    else:
+        qsub = qmax * numpy.exp(-f * (smax - soil))
+        qsurf = 0.0
+        et = pet * (soil / smax)
+
+    # Water balance equations
+    ds1 = ps - m
+    ds2 = pr + m - et - qsub - qsurf
+
+    return ds1, ds2, qsub + qsurf, et, m
+
+# ----------------------------------------------------------------
+
+
+@njit(cache=True)
+def _rk4(p, pet, t, para, x0, qsim, et, melt, states, day0):
+
+    """ Runge-Kutta 4th order integration of the EXP-HYDRO equations."""
+
+    f = para[0]
+    smax = para[1]
+    qmax = para[2]
+    ddf = para[3]
+    mint = para[4]
+    maxt = para[5]
+
+    n = len(p)
+    s1 = x0[0]
+    s2 = x0[1]
+    states[0, 0] = s1
+    states[0, 1] = s2
+
+    for i in range(n - 1):
+
+        # The half time step is rounded to the nearest even day, as
+        # done by the built-in round function in ExphydroModel.waterbalance
+        if (day0 + i) % 2 == 0:
+            th = i
+        else:
+            th = i + 1
+
+        k11, k12, qsim[i], et[i], melt[i] = _rhs(p[i], t[i], pet[i], s1, s2,
+                                                 f, smax, qmax, ddf, mint, maxt)
+        k21, k22, qsim[th], et[th], melt[th] = _rhs(p[th], t[th], pet[th], s1 + 0.5*k11, s2 + 0.5*k12,
+                                                    f, smax, qmax, ddf, mint, maxt)
+        k31, k32, qsim[th], et[th], melt[th] = _rhs(p[th], t[th], pet[th], s1 + 0.5*k21, s2 + 0.5*k22,
+                                                    f, smax, qmax, ddf, mint, maxt)
+        k41, k42, qsim[i+1], et[i+1], melt[i+1] = _rhs(p[i+1], t[i+1], pet[i+1], s1 + k31, s2 + k32,
+                                                       f, smax, qmax, ddf, mint, maxt)
+
+        s1 = s1 + (k11 + 2.0 * (k21 + k31) + k41) / 6.0
+        s2 = s2 + (k12 + 2.0 * (k22 + k32) + k42) / 6.0
+        states[i+1, 0] = s1
+        states[i+1, 1] = s2
+
+# ----------------------------------------------------------------
+
+
+def solve_rk4(p, pet, t, para, x0, qsim, et, melt, day0=0):
+
+    """ This function integrates the EXP-HYDRO equations over the entire
+    time-series with the Runge-Kutta 4th order method.
+
+    Args:
+        (1) p: Daily precipitation time-series (mm/day)
+        (2) pet: Daily potential evapotranspiration time-series (mm/day)
+        (3) t: Daily mean air temperature time-series (deg C)
+        (4) para: Parameter values in the order f, smax, qmax, ddf, mint, maxt
+        (5) x0: Initial storage of snow and soil buckets (mm)
+        (6) qsim, et, melt: Preallocated output arrays of the same length as p,
+            into which the simulated streamflow, ET and snowmelt are written.
+        (7) day0: (Optional) Day number of the first day of the time-series.
+
+    Returns the storage of snow and soil buckets at each time step.
+    """
+
+    para = numpy.asarray(para, dtype=numpy.float64)
+    x0 = numpy.asarray(x0, dtype=numpy.float64)
+    states = numpy.zeros((len(p), 2))
+
+    _rk4(p, pet, t, para, x0, qsim, et, melt, states, day0)
+
+    return states
+
+######################################################################
@@ -4,7 +4,10 @@
 # This file is part of the 'exphydro.lumped' package.
 
 import numpy
+import warnings
+from scipy import sparse
 from hydroutils import OdeSolver
+from . import ExphydroKernel
 
 
 ######################################################################
@@ -18,7 +21,14 @@ class ExphydroModel(object):
     evapotranspiration (et)
     """
 
-    def __init__(self, p, pet, t):
+    # ODE solvers that can be used by the simulate method
+    solvers = ('rk4', 'rk45', 'rk4_kernel')
+
+    # Arrays that are only read (or replaced) by a simulation, which worker processes
+    # can use from shared memory (see hydroutils.SharedArrays)
+    sharedattributes = ('P', 'PET', 'T', 'states', 'qsimbatch')
+
+    def __init__(self, p, pet, t, solver='rk4'):
 
         """ This method is used to initialise, i.e., create an instance of the ExphydroModel class.
 
@@ -28,6 +38,16 @@ class ExphydroModel(object):
             (1) p: Daily precipitation time-series (mm/day)
             (2) pet: Daily potential evapotranspiration time-series (mm/day)
             (3) t: Daily mean air temperature time-series (deg C)
+            (4) solver: (Optional) Default ODE solver used by the simulate method.
+                'rk4': Runge-Kutta 4th order (OdeSolver.solve_rk4)
+                'rk45': Runge-Kutta 4-5th order with adaptive step size (OdeSolver.solve_rk45_batch).
+                        It is also used by the simulate_batch method, with the step size
+                        of each parameter set controlled separately.
+                'rk4_kernel': Runge-Kutta 4th order compiled kernel (ExphydroKernel.solve_rk4).
+                              It gives the same results as 'rk4' and is compiled with Numba if installed
+                              (in which case results agree with 'rk4' to floating point round-off).
+
+        The climate inputs are not copied, so they can be memory-mapped arrays (see hydroutils.ForcingData).
 
         """
 
@@ -37,6 +57,11 @@ class ExphydroModel(object):
         self.T = t  # Daily mean air temperature (deg C)
 
         self.timespan = self.P.shape[0]  # Time length of the simulation period
+        self.day0 = 0  # Day number of the first day of the simulation period
+
+        if solver not in self.solvers:
+            raise ValueError('Unknown ODE solver: %s' % solver)
+        self.solver = solver  # Default ODE solver
 
         # Below are the state and flux variables of EXP-HYDRO
         #  All of them are initialised to zero
@@ -45,6 +70,14 @@ class ExphydroModel(object):
         self.et = numpy.zeros(self.timespan)  # Simulated ET (mm/day)
         self.melt = numpy.zeros(self.timespan)  # Simulated snowmelt (mm/day)
 
+        # Below are the results of the last simulation that are needed to restart it
+        self.para = None  # Parameter set(s)
+        self.tlength = 0  # No. of simulated time steps
+        self.states = None  # Storage at each time step (only for the simulate method)
+        self.laststorage = None  # Storage at the last time step
+        self.qstart = 0  # Index of the first day in the streamflow of a batch (see simulate_weighted)
+        self.solverstats = None  # Statistics of the last 'rk45' integration (see OdeSolver.solve_rk45_batch)
+
     # ----------------------------------------------------------------
 
     def waterbalance(self, t, s, para):
@@ -61,7 +94,8 @@ class ExphydroModel(object):
 
         # The line below ensures that the time step of input and output variables is always an integer.
         # ODE solvers can take fractional time steps, for which input data does not exist.
-        tt = int(min(round(t), self.timespan-1))
+        # The day number of the first day is subtracted to get the index of the input data.
+        tt = int(min(round(t) - self.day0, self.timespan-1))
 
         # NOTE: The min condition in above line is very important and is needed when the ODE solver
         # jumps to a time-step that is beyond the time-series length.
@@ -152,15 +186,397 @@ class ExphydroModel(object):
 
     # ----------------------------------------------------------------
 
-    def simulate(self, para):
+    def waterbalance_single(self, t, s, para):
+
+        """ This method provides the right hand side of the dS/dt equations for a batch
+        containing one parameter set (see OdeSolver.solve_rk45_batch).
+        """
+
+        return self.waterbalance(t[0], s[0], para)[numpy.newaxis]
+
+    # ----------------------------------------------------------------
+
+    def waterbalance_batch(self, t, s, para):
+
+        """ This method provides the right hand side of the dS/dt equations
+        for a batch of parameter sets.
+
+        The storage s is an (N, 2) array and para is an (N, 6) array with the
+        parameter values in the order f, smax, qmax, ddf, mint, maxt.  The time t
+        is either the same for all parameter sets, or an array with one time per
+        parameter set.
+        """
+
+        # EXP-HYDRO parameter values from the parameter matrix
+        f = para[:, 0]
+        smax = para[:, 1]
+        qmax = para[:, 2]
+        ddf = para[:, 3]
+        mint = para[:, 4]
+        maxt = para[:, 5]
+
+        # Same time step handling as in the waterbalance method
+        if numpy.ndim(t) == 0:
+            tt = int(min(round(t) - self.day0, self.timespan-1))
+            members = slice(None)
+        else:
+            tt = numpy.minimum(numpy.round(t) - self.day0, self.timespan-1).astype(int)
+            members = numpy.arange(s.shape[0])
+
+        # Loading the input data for current time step. If each parameter set has its own
+        # time, each parameter set (i.e., pixel) takes its value from its own column.
+        if self.P.ndim == 1 or numpy.ndim(t) == 0:
+            p = self.P[tt]
+            te = self.T[tt]
+            pet = self.PET[tt]
+        else:
+            p = self.P[tt, members]
+            te = self.T[tt, members]
+            pet = self.PET[tt, members]
+
+        snow = s[:, 0]
+        soil = s[:, 1]
+
+        # Partitioning precipitation into rain and snow
+        ps = numpy.where(te < mint, p, 0.0)
+        pr = numpy.where(te < mint, 0.0, p)
+
+        # Snow bucket
+        m = numpy.where((te > maxt) & (snow > 0), numpy.minimum(snow, ddf*(te - maxt)), 0.0)
+
+        # Soil bucket. The soil storage is capped at smax inside the exponential
+        # so that the masked out values cannot overflow.
+        qsub = qmax * numpy.exp(-f * (smax - numpy.minimum(soil, smax)))
+        qsub = numpy.where(soil < 0, 0.0, numpy.where(soil > smax, qmax, qsub))
+        qsurf = numpy.where(soil > smax, soil - smax, 0.0)
+        et = numpy.where(soil < 0, 0.0, numpy.where(soil > smax, pet, pet * (soil / smax)))
+
+        # Water balance equations
+        ds = numpy.empty_like(s)
+        ds[:, 0] = ps - m
+        ds[:, 1] = pr + m - et - qsub - qsurf
+
+        # Writing the streamflow into the output variable for the current time step
+        self.qsimbatch[members, tt - self.qstart] = qsub + qsurf
+
+        return ds
+
+    # ----------------------------------------------------------------
+
+    def simulate(self, para, solver=None, tend=None):
 
         """ This method performs the integration of dS/dt equations
         over the entire simulation time period
+
+        Args:
+            (1) para: EXP-HYDRO parameter set (instance of ExphydroParameters)
+            (2) solver: (Optional) ODE solver to use instead of the default solver of the model.
+                        See the list of solvers in the __init__ method.
+            (3) tend: (Optional) Index of the last day that is needed from the simulation,
+                      e.g., the end of the calibration period. The integration is stopped
+                      soon after this day, and only the streamflow up to this day is returned.
         """
 
+        if solver is None:
+            solver = self.solver
+
+        # No. of time steps to integrate. The day after tend is also needed, because
+        # the final fluxes of day tend are calculated in the time step towards it.
+        tlength = self.timespan if tend is None else min(tend + 2, self.timespan)
+
         # Solving the ODE. To check which ODE solvers are available to use,
         # please check OdeSolver.py in hydroutils package
-        OdeSolver.solve_rk4(self.waterbalance, self.storage, para, tlength=self.timespan)
-        return self.qsim
+        if solver == 'rk4':
+            states = OdeSolver.solve_rk4(self.waterbalance, self.storage, para, tlength=tlength, t0=self.day0)
+        elif solver == 'rk45':
+            states, self.solverstats = OdeSolver.solve_rk45_batch(self.waterbalance_single, [self.storage], para,
+                                                                  tlength=tlength, t0=self.day0, keepstates=True)
+            states = states[:, 0]
+            self.checksolver()
+        elif solver == 'rk4_kernel':
+            states = ExphydroKernel.solve_rk4(self.P[:tlength], self.PET[:tlength], self.T[:tlength],
+                                              para.getvalues(), self.storage, self.qsim[:tlength],
+                                              self.et[:tlength], self.melt[:tlength], day0=self.day0)
+        else:
+            raise ValueError('Unknown ODE solver: %s' % solver)
+
+        # Keeping the states for a later restart of the simulation
+        self.para = para
+        self.tlength = tlength
+        self.states = states
+        self.laststorage = states[-1]
+
+        if tend is None:
+            return self.qsim
+        return self.qsim[:tend+1]
+
+    # ----------------------------------------------------------------
+
+    def checksolver(self):
+
+        """ This method warns about the parameter sets for which the 'rk45' integration failed."""
+
+        failed = numpy.flatnonzero(self.solverstats['failed'])
+        if failed.shape[0] > 0:
+            warnings.warn('The rk45 integration failed for %d parameter set(s): %s'
+                          % (failed.shape[0], failed.tolist()), RuntimeWarning)
+
+    # ----------------------------------------------------------------
+
+    def simulate_batch(self, param_matrix, tend=None, dtype=None):
+
+        """ This method performs the integration of dS/dt equations over the
+        entire simulation time period for many parameter sets at once.
+        They are integrated with the Runge-Kutta 4th order method, or with the adaptive
+        Runge-Kutta 4-5th order method if the default ODE solver of the model is 'rk45'.
+
+        Args:
+            (1) param_matrix: (N, 6) array of parameter values. Each row is one parameter
+            set with values in the order f, smax, qmax, ddf, mint, maxt (see the
+            getvalues method of ExphydroParameters).
+            (2) tend: (Optional) Index of the last day that is needed from the simulation
+                      (see the simulate method).
+            (3) dtype: (Optional) Floating point type of the storage and streamflow, e.g.,
+                       numpy.float32 to halve the memory needed. By default it is float64.
+
+        Returns an (N, timespan) array of simulated streamflow (mm/day), or an (N, tend+1)
+        array if tend is given.
+        """
+
+        param_matrix = numpy.atleast_2d(numpy.asarray(param_matrix, dtype=dtype or float))
+        nsets = param_matrix.shape[0]
+
+        # No. of time steps to integrate (see the simulate method)
+        tlength = self.timespan if tend is None else min(tend + 2, self.timespan)
+
+        # All parameter sets start from the same initial storage, unless
+        # the initial storage is given for each parameter set (see setstate)
+        storage = numpy.array(numpy.broadcast_to(self.storage, (nsets, 2)), dtype=param_matrix.dtype)
+        self.qsimbatch = numpy.zeros((nsets, tlength), dtype=param_matrix.dtype)
+        self.qstart = 0
+
+        if self.solver == 'rk45':
+            laststorage, self.solverstats = OdeSolver.solve_rk45_batch(self.waterbalance_batch, storage, param_matrix,
+                                                                       tlength=tlength, t0=self.day0)
+            self.checksolver()
+        else:
+            laststorage = OdeSolver.solve_rk4_batch(self.waterbalance_batch, storage, param_matrix,
+                                                    tlength=tlength, t0=self.day0)
+
+        # Keeping the states for a later restart of the simulation
+        self.para = param_matrix
+        self.tlength = tlength
+        self.states = None
+        self.laststorage = laststorage
+
+        if tend is None:
+            return self.qsimbatch
+        return self.qsimbatch[:, :tend+1]
+
+    # ----------------------------------------------------------------
+
+    def simulate_weighted(self, param_matrix, weights, tend=None, blocksize=365, dtype=None):
+
+        """ This method performs the same integration as the simulate_batch method, but only
+        returns the weighted sum of the simulated streamflow of all parameter sets, e.g., the
+        streamflow at the outlet of a distributed model (see ExphydroDistrEngine).
+
+        The parameter sets are integrated in blocks of days.  The streamflow of each parameter
+        set is only kept for the days of one block, in a buffer that is reused for all blocks,
+        so the memory needed does not grow with the no. of parameter sets times the length of
+        the time-series.  The results are the same as those of simulate_batch.
+
+        Args:
+            (1) param_matrix: (N, 6) array of parameter values (see the simulate_batch method).
+            (2) weights: Weight of each parameter set (array of length N), or an (M, N) matrix
+                         (e.g., a scipy.sparse matrix) of the weights of M weighted sums.
+            (3) tend: (Optional) Index of the last day that is needed from the simulation
+                      (see the simulate method).
+            (4) blocksize: (Optional) No. of days integrated in each block.
+            (5) dtype: (Optional) Floating point type of the storage and streamflow of the
+                       parameter sets (see the simulate_batch method).
+
+        Returns the weighted streamflow (mm/day) of all days, or of the days up to tend
+        (an array with one row per weighted sum if weights is a matrix).
+        """
+
+        if not sparse.issparse(weights):
+            weights = numpy.asarray(weights)
+
+        param_matrix = numpy.atleast_2d(numpy.asarray(param_matrix, dtype=dtype or float))
+        nsets = param_matrix.shape[0]
+
+        if self.solver == 'rk45':
+            # The adaptive solver is not integrated in blocks
+            return weights.dot(self.simulate_batch(param_matrix, tend=tend, dtype=dtype))
+
+        # No. of time steps to integrate (see the simulate method)
+        tlength = self.timespan if tend is None else min(tend + 2, self.timespan)
+
+        storage = numpy.array(numpy.broadcast_to(self.storage, (nsets, 2)), dtype=param_matrix.dtype)
+        self.qsimbatch = numpy.zeros((nsets, min(blocksize, tlength - 1) + 1), dtype=param_matrix.dtype)
+        qsim = numpy.zeros(weights.shape[:-1] + (tlength,))
+
+        start = 0
+        while True:
+            stop = min(start + blocksize, tlength - 1)
+
+            # Integrating the block from the storage at its first day. The streamflow
+            # of the days start to stop is written into the buffer from its first column.
+            self.qstart = start
+            storage = OdeSolver.solve_rk4_batch(self.waterbalance_batch, storage, param_matrix,
+                                                tlength=stop-start+1, t0=self.day0+start)
+
+            if stop == tlength - 1:
+                break
+
+            # The streamflow of all days before the last day of the block is final
+            qsim[..., start:stop] = weights.dot(self.qsimbatch[:, :stop-start])
+            start = stop
+
+        qsim[..., start:] = weights.dot(self.qsimbatch[:, :tlength-start])
+
+        # Keeping the states for a later restart of the simulation. Only the streamflow
+        # of the days of the last block is kept.
+        self.para = param_matrix
+        self.tlength = tlength
+        self.states = None
+        self.laststorage = storage
+
+        if tend is None:
+            return qsim
+        return qsim[..., :tend+1]
+
+    # ----------------------------------------------------------------
+
+    def getstate(self, day=None):
+
+        """ This method exports the state of the model at the end of a simulation,
+        so that the simulation can later be continued from it (see setstate and advance).
+
+        Args:
+            (1) day: (Optional) Day number of the state. By default it is the last simulated day.
+            An earlier day can only be given after a run of the simulate method.
+
+        Returns a dictionary with the day number ('day'), the storage of snow and soil buckets
+        ('storage'), the fluxes ('qsim', 'et', 'melt') and climate inputs ('p', 'pet', 't') of that day.
+        After a run of simulate_batch, the storage has one row per parameter set and only
+        the streamflow flux is available.
+        """
+
+        if self.tlength == 0:
+            raise ValueError('The model has not been simulated yet')
+
+        if day is None:
+            day = self.day0 + self.tlength - 1
+        i = day - self.day0  # Index of the day in the input data
+
+        if i == self.tlength - 1:
+            storage = self.laststorage
+        elif 0 <= i < self.tlength and self.states is not None:
+            storage = self.states[i]
+        else:
+            raise ValueError('The state of day %d is not available' % day)
+
+        state = {'day': day, 'storage': numpy.array(storage),
+                 'p': numpy.array(self.P[i]), 'pet': numpy.array(self.PET[i]), 't': numpy.array(self.T[i])}
+
+        if self.states is not None:
+            state.update(qsim=self.qsim[i], et=self.et[i], melt=self.melt[i])
+        else:
+            state.update(qsim=self.qsimbatch[:, i - self.qstart].copy())
+
+        return state
+
+    # ----------------------------------------------------------------
+
+    def setstate(self, state):
+
+        """ This method imports a state that was exported with getstate.
+
+        The simulation period of the model becomes the single day of the state, and
+        it can be extended with the advance method.  The climate inputs of the
+        earlier days are not needed to continue the simulation.
+        """
+
+        self.day0 = state['day']
+        self.storage = numpy.array(state['storage'], dtype=float)
+
+        # Climate inputs of the day of the state
+        self.P = numpy.array(state['p'], dtype=float)[numpy.newaxis]
+        self.PET = numpy.array(state['pet'], dtype=float)[numpy.newaxis]
+        self.T = numpy.array(state['t'], dtype=float)[numpy.newaxis]
+        self.timespan = 1
+
+        self.tlength = 1
+        self.laststorage = self.storage.copy()
+
+        if self.storage.ndim == 1:
+            # State of a single parameter set
+            self.qsim = numpy.array([state['qsim']], dtype=float)
+            self.et = numpy.array([state['et']], dtype=float)
+            self.melt = numpy.array([state['melt']], dtype=float)
+            self.states = self.storage[numpy.newaxis].copy()
+        else:
+            # State of a batch of parameter sets (see simulate_batch)
+            self.qsim = numpy.zeros(1)
+            self.et = numpy.zeros(1)
+            self.melt = numpy.zeros(1)
+            self.states = None
+            self.qsimbatch = numpy.array(state['qsim'], dtype=float).reshape(-1, 1)
+            self.qstart = 0
+
+    # ----------------------------------------------------------------
+
+    def appendinputs(self, p, pet, t):
+
+        """ This method starts a new simulation period at the last simulated day,
+        which is followed by the days of the new climate inputs.
+
+        The fluxes of the last simulated day are calculated again in the new simulation,
+        because the final fluxes of a day depend on the climate inputs of the next day.
+        """
+
+        self.setstate(self.getstate())
+
+        self.P = numpy.concatenate((self.P, p))
+        self.PET = numpy.concatenate((self.PET, pet))
+        self.T = numpy.concatenate((self.T, t))
+        self.timespan = self.P.shape[0]
+
+        self.qsim = numpy.zeros(self.timespan)
+        self.et = numpy.zeros(self.timespan)
+        self.melt = numpy.zeros(self.timespan)
+
+    # ----------------------------------------------------------------
+
+    def advance(self, p, pet, t, para=None):
+
+        """ This method continues the simulation from the last simulated day (or from
+        a state imported with setstate) over new days of climate inputs.  The results
+        are the same as those of a simulation over the entire time-series.  The fluxes
+        of the last day are recalculated in the next call, because they depend on the
+        climate inputs of the next day (see ExphydroModel.appendinputs).
+
+        Args:
+            (1) p: Daily precipitation of the new days (mm/day)
+            (2) pet: Daily potential evapotranspiration of the new days (mm/day)
+            (3) t: Daily mean air temperature of the new days (deg C)
+            (4) para: (Optional) EXP-HYDRO parameter set. By default it is the parameter set of the last simulation.
+
+        Returns the simulated streamflow of the new days (mm/day). If the simulation was
+        made with simulate_batch, it is an array with one row per parameter set.
+        """
+
+        if para is None:
+            para = self.para
+        if para is None:
+            raise ValueError('A parameter set is needed, because the model has not been simulated yet')
+
+        self.appendinputs(p, pet, t)
+
+        if self.states is None:
+            return self.simulate_batch(para)[:, 1:]
+        return self.simulate(para)[1:]
 
 ######################################################################
@@ -3,6 +3,7 @@
 # Programmer(s): Sopan Patil.
 # This file is part of the 'exphydro.lumped' package.
 
+import numpy
 from hydroutils import Parameter
 
 
@@ -43,6 +44,62 @@ class ExphydroParameters(object):
 
     # ----------------------------------------------------------------
 
+    def getvalues(self):
+
+        """ This method returns the parameter values as an array, in the
+        same order as the input arguments of assignvalues.
+        """
+
+        return numpy.array([self.f.value, self.smax.value, self.qmax.value,
+                            self.ddf.value, self.mint.value, self.maxt.value])
+
+    # ----------------------------------------------------------------
+
+    def setvalues(self, values):
+
+        """ This method assigns the parameter values from an array, given in
+        the same order as returned by getvalues.
+        """
+
+        self.assignvalues(*values)
+
+    # ----------------------------------------------------------------
+
+    def getvelocities(self):
+
+        """ This method returns the parameter velocities (used for PSO algorithm)
+        as an array, in the same order as returned by getvalues.
+        """
+
+        return numpy.array([self.f.velocity, self.smax.velocity, self.qmax.velocity,
+                            self.ddf.velocity, self.mint.velocity, self.maxt.velocity])
+
+    # ----------------------------------------------------------------
+
+    def setvelocities(self, velocities):
+
+        """ This method assigns the parameter velocities from an array, given in
+        the same order as returned by getvalues.
+        """
+
+        [self.f.velocity, self.smax.velocity, self.qmax.velocity,
+         self.ddf.velocity, self.mint.velocity, self.maxt.velocity] = velocities
+
+    # ----------------------------------------------------------------
+
+    def getbounds(self):
+
+        """ This method returns the lower and upper bounds of the parameters
+        as two arrays, in the same order as returned by getvalues.
+        """
+
+        lb = numpy.array([self.f.lb, self.smax.lb, self.qmax.lb, self.ddf.lb, self.mint.lb, self.maxt.lb])
+        ub = numpy.array([self.f.ub, self.smax.ub, self.qmax.ub, self.ddf.ub, self.mint.ub, self.maxt.ub])
+
+        return lb, ub
+
+    # ----------------------------------------------------------------
+
     def updateparameters(self, param1, param2, w):
 
         """ This method is used for PSO algorithm.
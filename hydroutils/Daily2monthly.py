@@ -17,16 +17,66 @@ class Daily2monthly(object):
 
     (2) average: calculates arithmetic average of all the daily values in the month.
 
+    (3) aggregate: Converts daily data into monthly, annual, water year or seasonal data
+    by summing up, averaging, or taking the minimum or maximum of the daily values.
+
     """
 
+    # Aggregation methods of the aggregate method
+    reducers = {'sum': numpy.add, 'mean': numpy.add, 'min': numpy.minimum, 'max': numpy.maximum}
+
     @staticmethod
-    def summation(dailydata, yyyy, mm, dd):
+    def periods(ndays, yyyy, mm, dd, freq='monthly'):
 
-        """ This method converts daily data into monthly data by summing up all the data values
-        in a given month.  It is suitable for data such as rainfall.
+        """ This method returns the index values of the first day of each period
+        in a daily time-series.
 
         Args:
-            (1) dailydata: Time series of daily data
+            (1) ndays: Length of the daily time-series
+
+            (2) yyyy: Calendar year of the first day in the time-series
+
+            (3) mm: Calendar month of the first day in the time-series
+
+            (4) dd: Calendar day of the first day in the time-series
+
+            (5) freq: (Optional) Length of the periods, which is one of:
+                'monthly': Calendar months
+                'annual': Calendar years
+                'wateryear': Water years from October to September
+                'seasonal': Seasons DJF, MAM, JJA and SON (December is in the winter of the next year)
+
+        """
+
+        daystart = numpy.datetime64(datetime.date(yyyy, mm, dd), 'D')  # Date of first day in time-series
+
+        # Months since January 1970 of each day of the time-series
+        months = (daystart + numpy.arange(ndays)).astype('datetime64[M]').astype(numpy.int64)
+
+        if freq == 'monthly':
+            period = months
+        elif freq == 'annual':
+            period = months // 12
+        elif freq == 'wateryear':
+            period = (months + 3) // 12
+        elif freq == 'seasonal':
+            period = (months + 1) // 3
+        else:
+            raise ValueError('Unknown aggregation period: ' + str(freq))
+
+        # Days on which the period changes
+        return numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(period)) + 1))
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def aggregate(dailydata, yyyy, mm, dd, freq='monthly', how='sum', axis=0):
+
+        """ This method converts daily data into data over longer periods.
+
+        Args:
+            (1) dailydata: Time series of daily data. It can also be a 2-D array containing
+                           many time-series (e.g., one for each pixel or ensemble member).
 
             (2) yyyy: Calendar year of the first day in dailydata
 
@@ -34,35 +84,42 @@ class Daily2monthly(object):
 
             (4) dd: Calendar day of the first day in dailydata
 
-        """
+            (5) freq: (Optional) 'monthly', 'annual', 'wateryear' or 'seasonal' (see the periods method)
+
+            (6) how: (Optional) 'sum', 'mean', 'min' or 'max' of the daily values in each period
 
-        daystart = datetime.date(yyyy, mm, dd)  # This is the date of first day in daily time-series
+            (7) axis: (Optional) Time axis of dailydata
 
-        # Create a date array that is the same length as the daily data
-        dayarr = numpy.array([daystart + datetime.timedelta(days=i) for i in xrange(dailydata.shape[0])])
+        Returns an array with the same shape as dailydata, except that the time axis
+        has one value per period.  The first and last periods can be incomplete.
 
-        mondatatmp = dailydata[0]  # Store first day's value into a temporary variable
-        mondata = []
+        """
 
-        for j in range(1, dayarr.shape[0]):
-            if dayarr[j].month == dayarr[j-1].month:  # If j is in the same month
-                mondatatmp += dailydata[j]
-            else:
-                mondata = numpy.append(mondata, mondatatmp)  # Writing monthly summation into mondata variable
-                mondatatmp = dailydata[j]  # Reset mondatatmp variable on the first day of month
+        if how not in Daily2monthly.reducers:
+            raise ValueError('Unknown aggregation method: ' + str(how))
 
-            if j == dayarr.shape[0] - 1:  # If j is on the last day of time-series
-                mondata = numpy.append(mondata, mondatatmp)  # Add the data from last month
+        dailydata = numpy.asarray(dailydata)
+        ndays = dailydata.shape[axis]
+        starts = Daily2monthly.periods(ndays, yyyy, mm, dd, freq)
 
-        return mondata
+        aggdata = Daily2monthly.reducers[how].reduceat(dailydata, starts, axis=axis)
+
+        if how == 'mean':
+            # No. of days in each period
+            ndaysper = numpy.diff(numpy.append(starts, ndays))
+            shape = [1]*aggdata.ndim
+            shape[axis] = ndaysper.shape[0]
+            aggdata = aggdata/ndaysper.reshape(shape)
+
+        return aggdata
 
     # ----------------------------------------------------------------
 
     @staticmethod
-    def average(dailydata, yyyy, mm, dd):
+    def summation(dailydata, yyyy, mm, dd):
 
-        """ This method converts daily data into monthly data by averaging all the data values
-            in a given month.  It is suitable for data such as air temperature.
+        """ This method converts daily data into monthly data by summing up all the data values
+        in a given month.  It is suitable for data such as rainfall.
 
         Args:
             (1) dailydata: Time series of daily data
@@ -73,29 +130,29 @@ class Daily2monthly(object):
 
             (4) dd: Calendar day of the first day in dailydata
 
-            """
+        """
 
-        daystart = datetime.date(yyyy, mm, dd)  # This is the date of first day in daily time-series
+        return Daily2monthly.aggregate(dailydata, yyyy, mm, dd, freq='monthly', how='sum')
 
-        # Create a date array that is the same length as the daily data
-        dayarr = numpy.array([daystart + datetime.timedelta(days=i) for i in xrange(dailydata.shape[0])])
+    # ----------------------------------------------------------------
 
-        mondatatmp = dailydata[0]  # Store first day's value into a temporary variable
-        k = 1.0
-        mondata = []
+    @staticmethod
+    def average(dailydata, yyyy, mm, dd):
 
-        for j in range(1, dayarr.shape[0]):
-            if dayarr[j].month == dayarr[j - 1].month:  # If j is in the same month
-                mondatatmp += dailydata[j]
-                k += 1.0  # increase the day count
-            else:
-                mondata = numpy.append(mondata, [mondatatmp/k])  # Writing monthly average into mondata variable
-                mondatatmp = dailydata[j]  # Reset mondatatmp variable on the first day of month
-                k = 1.0  # reset the k counter to 1 at the start of the month
+        """ This method converts daily data into monthly data by averaging all the data values
+            in a given month.  It is suitable for data such as air temperature.
+
+        Args:
+            (1) dailydata: Time series of daily data
+
+            (2) yyyy: Calendar year of the first day in dailydata
+
+            (3) mm: Calendar month of the first day in dailydata
 
-            if j == dayarr.shape[0] - 1:  # If j is on the last day of time-series
-                mondata = numpy.append(mondata, [mondatatmp/k])  # Add the data from last month
+            (4) dd: Calendar day of the first day in dailydata
+
+            """
 
-        return mondata
+        return Daily2monthly.aggregate(dailydata, yyyy, mm, dd, freq='monthly', how='mean')
 
 ######################################################################
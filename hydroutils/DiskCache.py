@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import os
+import inspect
+import hashlib
+from scipy import sparse
+
+
+######################################################################
+
+class DiskCache(object):
+
+    """ The 'DiskCache' class keeps the simulated time-series of a model in files,
+    so that a simulation that was already run (also in an earlier program run)
+    is read from a file instead of being simulated again.
+
+    It wraps a model and can be used instead of it (e.g., in the Calibration methods).
+    Each simulation is stored in a binary .npz file whose name is a hash of everything that
+    determines the simulation: the type of model, its climate inputs, its initial state,
+    its ODE solver, pixel weights and floating point type (if any), how the pixels are
+    simulated (see ExphydroDistrEngine), the parameter values and tend.  When the files
+    exceed the size limit, the least recently used ones are deleted.  Several processes can
+    use the same cache directory, because each file is written completely before it appears.
+
+    The climate inputs are only hashed again when they are replaced by other arrays (e.g., by
+    setstate or appendinputs), so they must not be changed in place.  The size of the cache
+    files is counted as they are written, and the directory is only scanned when the count
+    exceeds the size limit.  The files written by other processes are counted at that scan.
+    """
+
+    # Attributes of a model (or of the models it contains) that determine its simulations
+    inputs = ('P', 'PET', 'T')
+    settings = ('storage', 'day0', 'solver', 'weights', 'dtype', 'chunksize', 'keeppixels')
+
+    def __init__(self, model, cachedir, maxbytes=2**30, fluxes=False):
+
+        """ This method is used to create an instance of the DiskCache class.
+
+        Syntax: DiskCache(model, cachedir, maxbytes, fluxes)
+
+        Args:
+            (1) model: Instance of the user provided model (e.g., ExphydroModel or ExphydroDistrModel).
+            The class file of user's model MUST contain a method called 'simulate', and the parameter
+            sets MUST contain a method called 'getvalues' (see ExphydroParameters).  If the model also
+            contains the method 'simulate_batch', it is cached as well.
+
+            (2) cachedir: Directory of the cache files.
+
+            (3) maxbytes: (Optional) Size limit of all cache files (bytes).
+
+            (4) fluxes: (Optional) If True, the simulated ET and snowmelt of a lumped model
+                        are also stored, and the simulated streamflow, ET and snowmelt are
+                        restored into the model when the simulation is read from a file.
+        """
+
+        self.model = model
+        self.cachedir = cachedir
+        self.maxbytes = maxbytes
+        self.fluxes = fluxes
+        self.hits = 0  # No. of simulations read from files
+        self.misses = 0  # No. of simulations that were run
+        self.nbytes = None  # Size of the cache files (bytes), counted from the first scan of the directory
+
+        os.makedirs(cachedir, exist_ok=True)
+
+        # Only pass the 'tend' argument to the simulate method if it accepts it
+        self.hastend = 'tend' in inspect.signature(model.simulate).parameters
+
+        # Climate inputs of the model and their hash (see the hashinputs method)
+        self.inputhash = None
+
+        if hasattr(model, 'simulate_batch'):
+            self.simulate_batch = self.cached_batch
+
+    # ----------------------------------------------------------------
+
+    def __getattr__(self, name):
+
+        # All other attributes are those of the wrapped model
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def hashattributes(obj, names, sha=None, seen=None):
+
+        """ This method returns the SHA-256 hash of the given attributes of an object
+        and of the objects it contains (e.g., the lumped model of a distributed model).
+        """
+
+        if sha is None:
+            sha = hashlib.sha256()
+            seen = set()
+        seen.add(id(obj))
+
+        for key, item in sorted(vars(obj).items()):
+            if key in names:
+                sha.update(key.encode())
+                if isinstance(item, numpy.ndarray):
+                    sha.update(str((item.dtype.str, item.shape)).encode())
+                    sha.update(numpy.ascontiguousarray(item).data)
+                elif sparse.issparse(item):
+                    # The repr of a sparse matrix does not contain its values
+                    item = sparse.csr_matrix(item)
+                    sha.update(str(('sparse', item.dtype.str, item.shape)).encode())
+                    for array in (item.data, item.indices, item.indptr):
+                        sha.update(numpy.ascontiguousarray(array).data)
+                else:
+                    sha.update(repr(item).encode())
+            elif (hasattr(item, '__dict__') and type(item).__module__ != 'builtins' and
+                  not isinstance(item, type) and id(item) not in seen):
+                DiskCache.hashattributes(item, names, sha, seen)
+
+        return sha.hexdigest()
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def hashinputs(model, last=None):
+
+        """ This method returns the climate inputs of a model (and of the models it contains)
+        and their hash, as a tuple.  The hash of 'last', an earlier result of this method,
+        is returned again if the climate inputs are still the same arrays.
+        """
+
+        inputs = DiskCache.findattributes(model, DiskCache.inputs)
+        if (last is not None and len(inputs) == len(last[0]) and
+                all(new is old for new, old in zip(inputs, last[0]))):
+            return last
+
+        return inputs, DiskCache.hashattributes(model, DiskCache.inputs)
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def findattributes(obj, names, found=None, seen=None):
+
+        """ This method returns the values of the given attributes of an object and of the
+        objects it contains, in the order in which hashattributes hashes them.
+        """
+
+        if found is None:
+            found = []
+            seen = set()
+        seen.add(id(obj))
+
+        for key, item in sorted(vars(obj).items()):
+            if key in names:
+                found.append(item)
+            elif (hasattr(item, '__dict__') and type(item).__module__ != 'builtins' and
+                  not isinstance(item, type) and id(item) not in seen):
+                DiskCache.findattributes(item, names, found, seen)
+
+        return found
+
+    # ----------------------------------------------------------------
+
+    def modelkey(self):
+
+        """ This method returns the hash of the type, climate inputs and
+        settings of the model (see the settings attribute).
+        """
+
+        self.inputhash = DiskCache.hashinputs(self.model, self.inputhash)
+
+        sha = hashlib.sha256()
+        sha.update((type(self.model).__module__ + '.' + type(self.model).__name__).encode())
+        sha.update(self.inputhash[1].encode())
+        sha.update(DiskCache.hashattributes(self.model, DiskCache.settings).encode())
+
+        return sha.hexdigest()
+
+    # ----------------------------------------------------------------
+
+    def filename(self, values, tend, modelkey):
+
+        """ This method returns the name of the cache file of a simulation."""
+
+        sha = hashlib.sha256()
+        sha.update(modelkey.encode())
+        sha.update(numpy.asarray(values, dtype=float).tobytes())
+        sha.update(repr(tend).encode())
+
+        return os.path.join(self.cachedir, sha.hexdigest() + '.npz')
+
+    # ----------------------------------------------------------------
+
+    def read(self, filename, restore=False):
+
+        """ This method returns the simulated streamflow in a cache file, or None
+        if the file does not exist.  If restore is True, the fluxes in the file are
+        restored into the model (see the fluxes argument of the __init__ method).
+        """
+
+        try:
+            with numpy.load(filename) as data:
+                simdata = data['qsim']
+                if restore and self.fluxes and 'et' in data:
+                    # Restore the fluxes of the simulation into the model
+                    for name in ('qsim', 'et', 'melt'):
+                        getattr(self.model, name)[:simdata.shape[0]] = data[name]
+            os.utime(filename)  # The file is now the most recently used
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return simdata
+
+    # ----------------------------------------------------------------
+
+    def write(self, filename, arrays):
+
+        """ This method writes a cache file and deletes the least
+        recently used cache files if the size limit is exceeded.
+        """
+
+        # Write to a temporary file first, so that other processes never read an incomplete file
+        tmpfile = filename + '.%d.tmp' % os.getpid()
+        with open(tmpfile, 'wb') as fout:
+            numpy.savez(fout, **arrays)
+        os.replace(tmpfile, filename)
+
+        if self.nbytes is not None:
+            self.nbytes += os.path.getsize(filename)
+        if self.nbytes is None or self.nbytes > self.maxbytes:
+            self.evict()
+
+    # ----------------------------------------------------------------
+
+    def simulate(self, para, tend=None):
+
+        """ This method reads the simulated time-series of a parameter set from its cache file,
+        or simulates the model (see the simulate method of the model) and writes the cache file.
+        """
+
+        filename = self.filename(para.getvalues(), tend, self.modelkey())
+        simdata = self.read(filename, restore=True)
+        if simdata is not None:
+            return simdata
+
+        if self.hastend:
+            simdata = self.model.simulate(para, tend=tend)
+        else:
+            simdata = self.model.simulate(para)
+
+        arrays = {'qsim': simdata}
+        if self.fluxes and hasattr(self.model, 'et') and hasattr(self.model, 'melt'):
+            arrays['et'] = self.model.et[:simdata.shape[0]]
+            arrays['melt'] = self.model.melt[:simdata.shape[0]]
+        self.write(filename, arrays)
+
+        return simdata
+
+    # ----------------------------------------------------------------
+
+    def cached_batch(self, param_matrix, tend=None):
+
+        """ This method is used as the 'simulate_batch' method (see ExphydroModel).
+        Only the parameter sets that have no cache file are simulated, with one call
+        to the 'simulate_batch' method of the model.  The fluxes are not restored into the model.
+        """
+
+        param_matrix = numpy.atleast_2d(numpy.asarray(param_matrix, dtype=float))
+        modelkey = self.modelkey()
+        filenames = [self.filename(values, tend, modelkey) for values in param_matrix]
+        simlist = [self.read(filename) for filename in filenames]
+
+        missing = [i for i in range(len(filenames)) if simlist[i] is None]
+        if missing:
+            simbatch = self.model.simulate_batch(param_matrix[missing], tend=tend)
+            for j, i in enumerate(missing):
+                simlist[i] = simbatch[j]
+                self.write(filenames[i], {'qsim': simbatch[j]})
+
+        return numpy.array(simlist)
+
+    # ----------------------------------------------------------------
+
+    def evict(self):
+
+        """ This method deletes the least recently used cache files
+        until all cache files are within the size limit.  It scans the
+        cache directory and resets the size of the cache files.
+        """
+
+        files = []
+        for entry in os.scandir(self.cachedir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Deleted by another process
+            total -= size
+
+        self.nbytes = total
+
+    # ----------------------------------------------------------------
+
+    def clear(self):
+
+        """ This method deletes all cache files."""
+
+        self.nbytes = None
+        for entry in os.scandir(self.cachedir):
+            if entry.name.endswith('.npz'):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+######################################################################
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import os
+import json
+import hashlib
+
+
+######################################################################
+
+class ForcingData(object):
+
+    """ The 'ForcingData' class loads time-series (or days x pixels matrices) of
+    climate inputs and observed data from text files.
+
+    The first time a text file is loaded, it is converted into a binary .npy file
+    in a cache directory, together with a small JSON file of metadata (e.g., the start
+    date and units given in the header of the text file).  Later loads memory-map the
+    .npy file instead of parsing the text file again.  The cache is rebuilt when the
+    text file changes, or when the .npy file is not the one described by the JSON file.
+
+    The header of a text file is an optional first line such as:
+    # Day 1: 2001-01-01; Units: mm/day
+    """
+
+    @staticmethod
+    def readheader(filename):
+
+        """ This method returns the metadata given in the header line of a text file
+        as a dictionary, e.g., {'day1': '2001-01-01', 'units': 'mm/day'}.
+        """
+
+        meta = {}
+        with open(filename) as fin:
+            line = fin.readline().strip()
+
+        if line.startswith('#'):
+            for item in line.lstrip('#').split(';'):
+                if ':' in item:
+                    key, value = item.split(':', 1)
+                    meta[key.strip().lower().replace(' ', '')] = value.strip()
+
+        return meta
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def cachefiles(filename, cachedir=None):
+
+        """ This method returns the names of the .npy and JSON cache files of a text file,
+        e.g., 'P_test.txt.npy' and 'P_test.txt.json'.  The extension of the text file is kept,
+        so that text files that only differ by their extension have their own cache files.
+        By default, the cache directory is the '.cache' directory next to the text file.
+        """
+
+        if cachedir is None:
+            cachedir = os.path.join(os.path.dirname(os.path.abspath(filename)), '.cache')
+        name = os.path.basename(filename)
+
+        return os.path.join(cachedir, name + '.npy'), os.path.join(cachedir, name + '.json')
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def fileid(filename, usehash=False):
+
+        """ This method returns the properties of a text file that are used to decide
+        whether its cache is up to date: its size and modification time, and its SHA-256
+        hash if usehash is True.
+        """
+
+        stat = os.stat(filename)
+        fid = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+        if usehash:
+            sha = hashlib.sha256()
+            with open(filename, 'rb') as fin:
+                for block in iter(lambda: fin.read(1 << 20), b''):
+                    sha.update(block)
+            fid['sha256'] = sha.hexdigest()
+
+        return fid
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def npyid(npyfile):
+
+        """ This method returns the properties of a .npy cache file that are stored in its
+        JSON file: its inode, size and modification time.  They are kept when the file is
+        renamed, and change when the file is replaced by another one.
+        """
+
+        stat = os.stat(npyfile)
+
+        return {'inode': stat.st_ino, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def convert(filename, cachedir=None, usehash=False):
+
+        """ This method converts a text file into its .npy and JSON cache files
+        and returns the metadata.
+        """
+
+        npyfile, metafile = ForcingData.cachefiles(filename, cachedir)
+        os.makedirs(os.path.dirname(npyfile), exist_ok=True)
+
+        data = numpy.genfromtxt(filename)
+
+        meta = ForcingData.readheader(filename)
+        meta['source'] = ForcingData.fileid(filename, usehash)
+        meta['shape'] = list(data.shape)
+        meta['dtype'] = data.dtype.str
+
+        # Write to temporary files first, so that another process never reads an incomplete cache
+        tmp = '.%d.tmp' % os.getpid()
+        with open(npyfile + tmp, 'wb') as fout:
+            numpy.save(fout, data)
+        # The two files are replaced one after the other, so the JSON file records which .npy
+        # file it belongs to. A .npy file written by another process is then never trusted.
+        meta['cache'] = ForcingData.npyid(npyfile + tmp)
+        with open(metafile + tmp, 'w') as fout:
+            json.dump(meta, fout, indent=1)
+        os.replace(npyfile + tmp, npyfile)
+        os.replace(metafile + tmp, metafile)
+
+        return meta
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def metadata(filename, cachedir=None, usehash=False):
+
+        """ This method returns the metadata of a text file, and converts
+        the text file into its cache files if they are missing or out of date.
+
+        Args:
+            (1) filename: Name of the text file
+
+            (2) cachedir: (Optional) Directory of the cache files (see the cachefiles method)
+
+            (3) usehash: (Optional) If True, the cache is checked with the hash of the text file
+                         instead of its size and modification time.
+        """
+
+        npyfile, metafile = ForcingData.cachefiles(filename, cachedir)
+
+        try:
+            with open(metafile) as fin:
+                meta = json.load(fin)
+            fid = ForcingData.fileid(filename, usehash)
+            key = 'sha256' if usehash else 'mtime_ns'
+            if (meta['cache'] == ForcingData.npyid(npyfile) and meta['source']['size'] == fid['size'] and
+                    meta['source'].get(key) == fid[key]):
+                return meta
+        except (OSError, ValueError, KeyError):
+            pass
+
+        return ForcingData.convert(filename, cachedir, usehash)
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def load(filename, cachedir=None, usehash=False, mmap_mode='r'):
+
+        """ This method loads the data of a text file from its cache.
+
+        Args:
+            (1) filename, cachedir, usehash: See the metadata method.
+
+            (2) mmap_mode: (Optional) Memory-map mode of numpy.load. The default 'r' returns a
+                           read-only memory-mapped array. With None the data is read into memory.
+
+        The memory-mapped array can be given directly to the ExphydroModel and
+        ExphydroDistrModel classes, which do not copy their climate inputs.
+        """
+
+        ForcingData.metadata(filename, cachedir, usehash)
+        npyfile = ForcingData.cachefiles(filename, cachedir)[0]
+
+        return numpy.load(npyfile, mmap_mode=mmap_mode)
+
+######################################################################
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+from .PreparedObjective import PreparedObjective
+
+
+######################################################################
+
+class MultiGaugeObjective(object):
+
+    """ The 'MultiGaugeObjective' class combines an objective function over several
+    streamflow gauges (e.g., nested gauges of a catchment) into one objective function
+    value, which is the weighted mean of the objective function value at each gauge.
+
+    The observed and simulated data have one column per gauge, e.g., the streamflow
+    simulated at all gauges by a distributed model with a gauge routing matrix (see
+    ExphydroDistrEngine).  All gauges are thus scored from the same simulation.
+
+    It can be used as the objective function of the Calibration methods, e.g.:
+        objf = MultiGaugeObjective(ObjectiveFunction.klinggupta, weights=[0.5, 0.25, 0.25])
+        paramsmax = Calibration.pso_maximise(model, params, qobs, objf, calperiods_obs, calperiods_sim)
+    """
+
+    def __init__(self, objf, weights=None):
+
+        """ This method is used to create an instance of the MultiGaugeObjective class.
+
+        Syntax: MultiGaugeObjective(objf, weights)
+
+        Args:
+            (1) objf: Method from the ObjectiveFunction class specifying the objective function
+            at each gauge (see PreparedObjective).
+
+            (2) weights: (Optional) Relative weight of each gauge (array). By default all gauges
+                         have the same weight.
+        """
+
+        self.objf = objf
+        self.weights = None if weights is None else numpy.asarray(weights, dtype=float)
+
+    # ----------------------------------------------------------------
+
+    def prepare(self, obsdata, calperiods_obs=None):
+
+        """ This method returns the prepared objective of the observed data
+        (see PreparedMultiGauge and PreparedObjective.prepare).
+        """
+
+        return PreparedMultiGauge(self, obsdata, calperiods_obs)
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, obsdata, simdata):
+
+        """ This method calculates the objective function value of the simulated data.
+
+        Args:
+            (1) obsdata: Observed data, one column per gauge.
+            (2) simdata: Simulated data, one column per gauge.
+        """
+
+        return self.prepare(obsdata)(simdata)
+
+######################################################################
+
+
+class PreparedMultiGauge(object):
+
+    """ The 'PreparedMultiGauge' class is the prepared objective of a MultiGaugeObjective.
+    It holds one prepared objective (see PreparedObjective) for each gauge, so days with
+    missing observed data (NaN) are left out at each gauge separately.  It can be used
+    wherever a PreparedObjective is used.
+    """
+
+    def __init__(self, objf, obsdata, calperiods_obs=None):
+
+        """ This method is used to create an instance of the PreparedMultiGauge class.
+
+        Syntax: PreparedMultiGauge(objf, obsdata, calperiods_obs)
+
+        Args:
+            (1) objf: Instance of the MultiGaugeObjective class.
+
+            (2) obsdata: Observed data, one column per gauge.
+
+            (3) calperiods_obs: (Optional) Two element array (or list) specifying the index values
+                            of the start and end data points of calibration period for the observed data.
+        """
+
+        obsdata = numpy.asarray(obsdata)
+        if obsdata.ndim != 2:
+            raise ValueError('The observed data must have one column per gauge')
+
+        self.objf = objf
+        self.gauges = [PreparedObjective(objf.objf, obsdata[:, i], calperiods_obs) for i in range(obsdata.shape[1])]
+
+        if objf.weights is None:
+            self.weights = numpy.full(len(self.gauges), 1.0/len(self.gauges))
+        elif objf.weights.shape != (len(self.gauges),):
+            raise ValueError('There are %d gauge weights, but %d gauges' % (objf.weights.size, len(self.gauges)))
+        else:
+            self.weights = objf.weights/numpy.sum(objf.weights)
+
+    # ----------------------------------------------------------------
+
+    def pergauge(self, simdata):
+
+        """ This method returns the objective function value at each gauge.
+
+        Args:
+            (1) simdata: Simulated data over the calibration period, one column per gauge, or a
+            3-D array with the simulated data of one parameter set per row.
+
+        Returns an array with the value of each gauge in the last axis.
+        """
+
+        simdata = numpy.asarray(simdata)
+        if simdata.shape[-1] != len(self.gauges):
+            raise ValueError('The simulated data has %d gauges, but the observed data has %d'
+                             % (simdata.shape[-1], len(self.gauges)))
+
+        return numpy.stack([gauge(simdata[..., i]) for i, gauge in enumerate(self.gauges)], axis=-1)
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, simdata):
+
+        """ This method calculates the weighted mean of the objective function values of all gauges
+        (see the pergauge method).
+        """
+
+        return numpy.dot(self.pergauge(simdata), self.weights)[()]
+
+    # ----------------------------------------------------------------
+
+    def prepare(self, obsdata, calperiods_obs=None):
+
+        """ This method returns the prepared objective itself (see PreparedObjective.prepare)."""
+
+        return self
+
+######################################################################
@@ -8,8 +8,6 @@ from scipy import integrate
 import warnings
 
 
-warnings.filterwarnings("ignore")
-
 ######################################################################
 
 
@@ -19,8 +17,19 @@ class OdeSolver(object):
     Ordinary Differential Equations.
     """
 
+    # Coefficients of the Dormand-Prince method (used by solve_rk45_batch)
+    dp_c = (0.0, 1/5, 3/10, 4/5, 8/9, 1.0)
+    dp_a = ((),
+            (1/5,),
+            (3/40, 9/40),
+            (44/45, -56/15, 32/9),
+            (19372/6561, -25360/2187, 64448/6561, -212/729),
+            (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656))
+    dp_b = (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84)
+    dp_e = (71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
     @staticmethod
-    def solve_rk45(userfunction, initstate, userpara, tlength):
+    def solve_rk45(userfunction, initstate, userpara, tlength, t0=0):
 
         """ This method performs the integration of the user provided function
         over the specified simulation time period.
@@ -36,20 +45,37 @@ class OdeSolver(object):
 
             (4) tlength: time length of the model simulation period.
 
+            (5) t0: (Optional) Time at the start of the simulation period.
+
+        Returns the values of the state variables at each time step.
         """
 
+        x = numpy.array([initstate] * tlength)
+
         solver = integrate.ode(userfunction)
         solver.set_integrator('dopri5', atol=1e-6, rtol=1e-3)
-        solver.set_initial_value(initstate, 0.0)
+        solver.set_initial_value(initstate, t0)
         solver.set_f_params(userpara)
 
-        while solver.successful() and solver.t < tlength:
-            solver.integrate(solver.t+1)
+        i = 0
+        with warnings.catch_warnings():
+            # The integrator reports its failure as a warning, which is replaced by the one below
+            warnings.simplefilter('ignore', UserWarning)
+            while solver.successful() and solver.t < t0 + tlength:
+                solver.integrate(solver.t+1)
+                i += 1
+                if i < tlength:
+                    x[i] = solver.y
+
+        if not solver.successful():
+            warnings.warn('solve_rk45: the integration failed at t = %g' % solver.t, RuntimeWarning)
+
+        return x
 
 # ---------------------------------------------------------------------------------
 
     @staticmethod
-    def solve_rk4(f, x0, para, tlength):
+    def solve_rk4(f, x0, para, tlength, t0=0):
 
         """ This method performs the integration of the user provided function
         over the specified simulation time period.
@@ -64,8 +90,11 @@ class OdeSolver(object):
 
             (4) tlength: time length of the model simulation period.
 
+            (5) t0: (Optional) Time at the start of the simulation period.
+
+        Returns the values of the state variables at each time step.
         """
-        t = numpy.arange(tlength)
+        t = numpy.arange(t0, t0 + tlength)
         n = len(t)
         x = numpy.array([x0] * n)
 
@@ -77,5 +106,161 @@ class OdeSolver(object):
             k4 = h * f(t[i+1], x[i] + k3, para)
             x[i+1] = x[i] + (k1 + 2.0 * (k2 + k3) + k4) / 6.0
 
+        return x
+
+# ---------------------------------------------------------------------------------
+
+    @staticmethod
+    def solve_rk4_batch(f, x0, para, tlength, t0=0):
+
+        """ This method performs the integration of a batch of independent ODE systems
+        over the specified simulation time period.
+        The ODE solver used is Runge-Kutta 4th order, with the same time stepping as solve_rk4.
+
+        Only the current state of the batch is kept in memory, so the user provided function
+        must record any output variables it needs at each time step.
+
+        Args:
+            (1) f: Function that provides the right hand side equations of the ODE systems.
+            It must accept (and return) a 2-D array of states with one row per batch member.
+
+            (2) x0: Initial values of the state variables (one row per batch member)
+
+            (3) para: Parameter sets of the user's model (one row per batch member)
+
+            (4) tlength: time length of the model simulation period.
+
+            (5) t0: (Optional) Time at the start of the simulation period.
+
+        Returns the state variables of the batch at the end of the simulation period.
+        They are integrated in single precision if x0 is a float32 array, and otherwise in double precision.
+        """
+        x = numpy.array(x0, dtype=numpy.result_type(numpy.asarray(x0).dtype, numpy.float32))
+
+        for i in range(t0, t0 + tlength - 1):
+            k1 = f(i, x, para)
+            k2 = f(i + 0.5, x + 0.5 * k1, para)
+            k3 = f(i + 0.5, x + 0.5 * k2, para)
+            k4 = f(i + 1, x + k3, para)
+            x = x + (k1 + 2.0 * (k2 + k3) + k4) / 6.0
+
+        return x
+
+# ---------------------------------------------------------------------------------
+
+    @staticmethod
+    def solve_rk45_batch(f, x0, para, tlength, t0=0, atol=1e-6, rtol=1e-3, maxsteps=500, keepstates=False):
+
+        """ This method performs the integration of a batch of independent ODE systems
+        over the specified simulation time period.
+        The ODE solver used is Runge-Kutta 4-5th order with Dormand-Prince corrector.
+
+        Each batch member has its own adaptive step size and error control, with the same
+        tolerances as solve_rk45.  Like solve_rk45, each member is integrated up to the end of
+        every time step (i.e., every day), so its steps never cross the end of a time step.
+
+        Args:
+            (1) f: Function that provides the right hand side equations of the ODE systems.
+            It must accept an array of times (one per batch member) and a 2-D array of states
+            with one row per batch member, and return the 2-D array of derivatives.
+
+            (2) x0: Initial values of the state variables (one row per batch member)
+
+            (3) para: Parameter sets of the user's model (one row per batch member)
+
+            (4) tlength: time length of the model simulation period.
+
+            (5) t0: (Optional) Time at the start of the simulation period.
+
+            (6) atol, rtol: (Optional) Absolute and relative error tolerance.
+
+            (7) maxsteps: (Optional) Maximum no. of steps of a batch member in one time step.
+                          A batch member that needs more steps (or whose state is not finite)
+                          fails, and its state is no longer integrated.
+
+            (8) keepstates: (Optional) If True, the state variables at each time step are returned.
+
+        Returns the state variables of the batch at the end of the simulation period (or at each
+        time step if keepstates is True), and a dictionary of solver statistics:
+            'nsteps': No. of accepted steps of each batch member
+            'nrejected': No. of rejected steps of each batch member
+            'nfev': No. of calls of the function f (each one for the whole batch)
+            'failed': True for the batch members that failed
+        """
+
+        c, a, b, e = OdeSolver.dp_c, OdeSolver.dp_a, OdeSolver.dp_b, OdeSolver.dp_e
+
+        x = numpy.array(x0, dtype=float)
+        nmem = x.shape[0]
+        t = numpy.full(nmem, float(t0))
+        h = numpy.ones(nmem)  # Step size of each batch member
+
+        nsteps = numpy.zeros(nmem, dtype=int)
+        nrejected = numpy.zeros(nmem, dtype=int)
+        failed = numpy.zeros(nmem, dtype=bool)
+
+        if keepstates:
+            states = numpy.empty((tlength,) + x.shape)
+            states[0] = x
+
+        k = [f(t, x, para)]  # The first stage is the last stage of the previous step
+        nfev = 1
+
+        for tnext in range(t0 + 1, t0 + tlength):
+            ndaysteps = numpy.zeros(nmem, dtype=int)
+
+            while True:
+                active = ~failed & (t < tnext)
+                if not active.any():
+                    break
+
+                # Step size, which is shortened at the end of the time step
+                hstep = numpy.where(active, numpy.minimum(h, tnext - t), 0.0)
+                last = hstep == tnext - t
+                hc = hstep[:, numpy.newaxis]
+
+                # Runge-Kutta stages
+                del k[1:]
+                for i in range(1, 6):
+                    dx = sum(a[i][j]*k[j] for j in range(i))
+                    k.append(f(t + c[i]*hstep, x + hc*dx, para))
+                xnew = x + hc*sum(b[j]*k[j] for j in range(6))
+                k.append(f(t + hstep, xnew, para))
+                nfev += 6
+
+                # Error estimate of each batch member
+                xerr = hc*sum(e[j]*k[j] for j in range(7))
+                scale = atol + rtol*numpy.maximum(numpy.abs(x), numpy.abs(xnew))
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    err = numpy.sqrt(numpy.mean(numpy.square(xerr/scale), axis=1))
+                    fac = numpy.clip(0.9*err**-0.2, 0.2, 10.0)
+
+                accept = active & (err <= 1.0)
+                reject = active & ~accept
+
+                x[accept] = xnew[accept]
+                t[accept] = numpy.where(last, tnext, t + hstep)[accept]
+                k[0][accept] = k[6][accept]
+                nsteps += accept
+                nrejected += reject
+                ndaysteps += active
+
+                # New step size. It does not grow after a rejected step, and a step that was
+                # shortened at the end of the time step does not reduce it.
+                fac = numpy.where(reject, numpy.minimum(fac, 1.0), fac)
+                hnew = hstep*fac
+                h = numpy.where(active, numpy.where(accept & last, numpy.maximum(h, hnew), hnew), h)
+
+                failed |= active & ((ndaysteps >= maxsteps) | ~numpy.isfinite(err) | ~numpy.isfinite(h))
+
+            if keepstates:
+                states[tnext - t0] = x
+
+        stats = {'nsteps': nsteps, 'nrejected': nrejected, 'nfev': nfev, 'failed': failed}
+
+        if keepstates:
+            return states, stats
+        return x, stats
+
 
 ##################################################################################
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+from .ObjectiveFunction import ObjectiveFunction
+
+
+######################################################################
+
+class PreparedObjective(object):
+
+    """ The 'PreparedObjective' class holds an objective function together with the
+    observed data of the calibration period, so that the statistics of the observed
+    data (mean and sum of squared deviations) are only calculated once.
+
+    Days with missing observed data (NaN) are left out of the objective function.
+    A prepared objective can score a single simulated time-series or a matrix of
+    simulated time-series (one per row) in one call.
+    """
+
+    def __init__(self, objf, obsdata, calperiods_obs=None):
+
+        """ This method is used to create an instance of the PreparedObjective class.
+
+        Syntax: PreparedObjective(objf, obsdata, calperiods_obs)
+
+        Args:
+            (1) objf: Method from the ObjectiveFunction class specifying the objective function.
+            Any other function with the same arguments can be used, but it is then called
+            once for each simulated time-series.
+
+            (2) obsdata: Time-series of the observed data.
+
+            (3) calperiods_obs: (Optional) Two element array (or list) specifying the index values
+                            of the start and end data points of calibration period for the observed data.
+        """
+
+        if calperiods_obs is not None:
+            obsdata = obsdata[calperiods_obs[0]:calperiods_obs[1]+1]
+
+        self.objf = objf
+
+        # Days with observed data
+        self.mask = ~numpy.isnan(obsdata)
+        self.masked = not self.mask.all()
+
+        # Statistics of the observed data
+        self.obsdata = obsdata[self.mask] if self.masked else obsdata
+        self.nobs = self.obsdata.shape[0]
+        self.xbar = numpy.mean(self.obsdata)
+        self.obsdev = self.obsdata - self.xbar
+        self.ssobs = numpy.sum(numpy.square(self.obsdev))
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def prepare(objf, obsdata, calperiods_obs=None):
+
+        """ This method returns the prepared objective of an objective function,
+        or objf itself if it is already a prepared objective.  An objective function
+        with its own 'prepare' method (e.g., MultiGaugeObjective) prepares itself.
+        """
+
+        if isinstance(objf, PreparedObjective):
+            return objf
+        if hasattr(objf, 'prepare'):
+            return objf.prepare(obsdata, calperiods_obs)
+        return PreparedObjective(objf, obsdata, calperiods_obs)
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, simdata):
+
+        """ This method calculates the objective function value of the simulated data.
+
+        Args:
+            (1) simdata: Time series of the simulated data over the calibration period,
+            or a 2-D array with one time series per row.
+
+        Returns the objective function value, or an array of values (one per row of simdata).
+        """
+
+        simdata = numpy.asarray(simdata)
+        if self.masked:
+            simdata = simdata[..., self.mask]
+
+        if self.objf is ObjectiveFunction.nashsutcliffe:
+            numer = numpy.sum(numpy.square(self.obsdata - simdata), axis=-1)
+            return 1.0 - (numer/self.ssobs)
+
+        if self.objf is ObjectiveFunction.klinggupta:
+            ybar = numpy.mean(simdata, axis=-1)
+            simdev = simdata - ybar[..., numpy.newaxis]
+            numer = numpy.sum(numpy.multiply(self.obsdev, simdev), axis=-1)
+            denom2 = numpy.sum(numpy.square(simdev), axis=-1)
+
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                r = numer/(numpy.sqrt(self.ssobs)*numpy.sqrt(denom2))
+                alpha = numpy.sqrt(denom2/self.nobs)/numpy.sqrt(self.ssobs/self.nobs)
+                beta = ybar/self.xbar
+                kge = 1.0 - numpy.sqrt(numpy.square(r-1.0) + numpy.square(alpha-1.0) + numpy.square(beta-1.0))
+
+            return numpy.where(denom2 == 0, -9999, kge)[()]
+
+        if simdata.ndim == 1:
+            return self.objf(self.obsdata, simdata)
+        return numpy.array([self.objf(self.obsdata, sim) for sim in simdata])
+
+######################################################################
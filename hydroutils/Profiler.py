@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import time
+import inspect
+from contextlib import contextmanager
+
+
+######################################################################
+
+class ProgressPrinter(object):
+
+    """ The 'ProgressPrinter' class is a progress callback of the Calibration methods, which
+    report no progress by default.  It prints the best objective function value so far, e.g.:
+    Swarm iteration: 3 , Best objfun value: 0.71
+
+    A progress callback is called by a Calibration method after each iteration with a dictionary
+    containing (at least) the following items:
+        'method': Name of the Calibration method (e.g., 'pso_maximise')
+        'iteration': Iteration number (e.g., swarm iteration or chunk of parameter sets), starting at 1
+        'nevals': No. of parameter sets evaluated so far
+        'objval': Best objective function value so far
+        'time': Wall time since the start of the calibration (seconds)
+    """
+
+    # Label and counter printed for each Calibration method
+    labels = {'pso_maximise': ('Swarm iteration:', 'iteration'),
+              'montecarlo_maximise': ('Iteration:', 'iteration'),
+              'montecarlo_stream': ('Iteration:', 'nevals'),
+              'montecarlo_screened': ('Evaluations:', 'nevals'),
+              'pso_async': ('Evaluations:', 'nevals')}
+
+    def __init__(self, every=1):
+
+        """ This method is used to create an instance of the ProgressPrinter class.
+
+        Syntax: ProgressPrinter(every)
+
+        Args:
+            (1) every: (Optional) Only every 'every'-th iteration is printed.
+        """
+
+        self.every = every
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, info):
+
+        if info['iteration'] % self.every == 0:
+            label, counter = self.labels.get(info['method'], ('Iteration:', 'iteration'))
+            print(label, info[counter], ', Best objfun value:', info['objval'])
+
+######################################################################
+
+
+class Profiler(object):
+
+    """ The 'Profiler' class collects counters and timings of simulations and calibrations.
+
+    It can be used in two ways, which can be combined:
+    (1) As the progress callback of a Calibration method (see ProgressPrinter), it times each
+        iteration (e.g., each swarm iteration of pso_maximise) and the no. of evaluations per second.
+    (2) Its 'wrap' method returns an instrumented model (see ProfiledModel), which counts the
+        simulations, the simulated days and the evaluations of the right-hand side of the ODEs,
+        and times each call to the simulate methods of the model.
+
+    Nothing is counted or timed unless a Profiler is used, so it costs nothing otherwise.
+    Simulations run by the worker processes of an executor are not counted.
+
+    Example:
+        profiler = Profiler(callback=ProgressPrinter(every=10))
+        paramsmax = Calibration.pso_maximise(profiler.wrap(model), ..., callback=profiler)
+        profiler.printreport()
+    """
+
+    def __init__(self, callback=None):
+
+        """ This method is used to create an instance of the Profiler class.
+
+        Syntax: Profiler(callback)
+
+        Args:
+            (1) callback: (Optional) Progress callback to which the progress of a calibration is
+                          passed on, e.g., ProgressPrinter(). By default nothing is printed.
+        """
+
+        self.callback = callback
+        self.counters = {}  # Counts, by name
+        self.timers = {}  # [No. of calls, total time, maximum time] (seconds), by name
+        self.models = []  # Models instrumented by this profiler
+        self.progress = None  # Last progress of a calibration
+
+    # ----------------------------------------------------------------
+
+    def count(self, name, n=1):
+
+        """ This method adds n to a counter."""
+
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # ----------------------------------------------------------------
+
+    def addtime(self, name, seconds):
+
+        """ This method adds the time of one call to a timer."""
+
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    # ----------------------------------------------------------------
+
+    @contextmanager
+    def timer(self, name):
+
+        """ This method times the code of a 'with' block, e.g.:
+        with profiler.timer('read inputs'):
+            ...
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addtime(name, time.perf_counter() - start)
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, info):
+
+        # Progress callback of a Calibration method (see ProgressPrinter)
+        if info['iteration'] == 1 or self.progress is None or self.progress['method'] != info['method']:
+            lasttime = 0.0  # A new calibration
+        else:
+            lasttime = self.progress['time']
+        self.addtime(info['method'] + ' iteration', info['time'] - lasttime)
+        self.progress = dict(info)
+
+        if self.callback is not None:
+            self.callback(info)
+
+    # ----------------------------------------------------------------
+
+    def wrap(self, model):
+
+        """ This method returns an instrumented model (see ProfiledModel)."""
+
+        profiled = ProfiledModel(model, self)
+        self.models.append(profiled)
+
+        return profiled
+
+    # ----------------------------------------------------------------
+
+    def reset(self):
+
+        """ This method sets all counters and timers back to zero."""
+
+        self.counters.clear()
+        self.timers.clear()
+        self.progress = None
+
+    # ----------------------------------------------------------------
+
+    def report(self):
+
+        """ This method returns the counters and timers as a dictionary with the items:
+            'counters': Counts, by name
+            'timers': No. of calls, total, mean and maximum time (seconds), by name
+            'evals_per_sec': Evaluations per second of the last calibration
+            'caches': Statistics of the simulation caches of the instrumented models
+                      (see SimulationCache and DiskCache)
+        """
+
+        timers = {}
+        for name, (ncalls, total, maxtime) in self.timers.items():
+            timers[name] = {'calls': ncalls, 'total': total, 'mean': total/ncalls, 'max': maxtime}
+
+        evalrate = None
+        if self.progress is not None and self.progress['time'] > 0:
+            evalrate = self.progress['nevals']/self.progress['time']
+
+        caches = []
+        for profiled in self.models:
+            # Follow the chain of models wrapped by each other
+            obj = profiled.model
+            while obj is not None:
+                if 'hits' in vars(obj) and 'misses' in vars(obj):
+                    caches.append({'cache': type(obj).__name__, 'hits': obj.hits, 'misses': obj.misses})
+                obj = vars(obj).get('model')
+
+        return {'counters': dict(self.counters), 'timers': timers, 'evals_per_sec': evalrate, 'caches': caches}
+
+    # ----------------------------------------------------------------
+
+    def printreport(self):
+
+        """ This method prints the counters and timers."""
+
+        report = self.report()
+
+        for name, value in sorted(report['counters'].items()):
+            print(name + ':', value)
+        for name, timer in sorted(report['timers'].items()):
+            print(name + ':', timer['calls'], 'calls, total', '%.4g s' % timer['total'],
+                  ', mean', '%.4g s' % timer['mean'], ', max', '%.4g s' % timer['max'])
+        if report['evals_per_sec'] is not None:
+            print('Evaluations per second:', '%.4g' % report['evals_per_sec'])
+        for cache in report['caches']:
+            print(cache['cache'], 'hits:', cache['hits'], ', misses:', cache['misses'])
+
+######################################################################
+
+
+class CountedFunction(object):
+
+    """ The 'CountedFunction' class counts the evaluations of the right-hand side of
+    the ODEs of a model (e.g., ExphydroModel.waterbalance) in a Profiler.  A call with
+    the storage of N parameter sets (a 2-D array) counts as N evaluations.
+    """
+
+    def __init__(self, function, profiler):
+
+        self.function = function
+        self.profiler = profiler
+
+    # ----------------------------------------------------------------
+
+    def __call__(self, t, s, para):
+
+        self.profiler.count('rhs evaluations', s.shape[0] if numpy.ndim(s) == 2 else 1)
+        return self.function(t, s, para)
+
+######################################################################
+
+
+class ProfiledModel(object):
+
+    """ The 'ProfiledModel' class wraps a model and counts and times its simulations
+    in a Profiler.  It can be used instead of the model (e.g., in the Calibration methods).
+
+    Each call to the 'simulate' and 'simulate_batch' methods is timed, and the
+    counters 'simulations' (parameter sets) and 'simulated days' (days times parameter sets) are
+    updated.  During each call, the right-hand side of the ODEs (the methods named in 'rhsnames')
+    of the model, and of the models it contains, are replaced by a CountedFunction.  They are
+    restored when the call returns (or raises an exception), so the wrapped model is only
+    changed while it is simulating.
+
+    The simulations of a call that evaluates none of these methods are also counted as
+    'simulations without rhs evaluations', e.g., simulations taken from a cache (see SimulationCache)
+    or run by a compiled kernel (the 'rk4_kernel' solver of ExphydroModel), which evaluates the
+    right-hand side itself.  Their right-hand side evaluations are missing from 'rhs evaluations'.
+    """
+
+    # Methods that evaluate the right-hand side of the ODEs of a model
+    rhsnames = ('waterbalance', 'waterbalance_batch')
+
+    def __init__(self, model, profiler):
+
+        """ This method is used to create an instance of the ProfiledModel class.
+
+        Syntax: ProfiledModel(model, profiler)
+
+        Args:
+            (1) model: Instance of the user provided model. The class file of user's model MUST
+            contain a method called 'simulate'.
+
+            (2) profiler: Instance of the Profiler class.
+        """
+
+        self.model = model
+        self.profiler = profiler
+
+        # Only pass the 'tend' argument to the simulate method if it accepts it
+        self.hastend = 'tend' in inspect.signature(model.simulate).parameters
+
+        if hasattr(model, 'simulate_batch'):
+            self.simulate_batch = self.profiled_batch
+
+        self.counted = []  # Objects whose right-hand side is counted (during a call)
+
+    # ----------------------------------------------------------------
+
+    def __getattr__(self, name):
+
+        # All other attributes are those of the wrapped model
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    # ----------------------------------------------------------------
+
+    def instrument(self, obj, seen):
+
+        """ This method replaces the right-hand side of the ODEs of an object
+        and of the objects it contains by a CountedFunction.
+        """
+
+        seen.add(id(obj))
+
+        for name in ProfiledModel.rhsnames:
+            if hasattr(type(obj), name) and name not in vars(obj):
+                setattr(obj, name, CountedFunction(getattr(obj, name), self.profiler))
+                self.counted.append((obj, name))
+
+        for item in list(vars(obj).values()):
+            if (hasattr(item, '__dict__') and type(item).__module__ != 'builtins' and
+                    not isinstance(item, type) and id(item) not in seen):
+                self.instrument(item, seen)
+
+    # ----------------------------------------------------------------
+
+    def detach(self):
+
+        """ This method restores the right-hand side of the ODEs of the wrapped model
+        (and of the models it contains) after a call.
+        """
+
+        for obj, name in self.counted:
+            delattr(obj, name)
+        del self.counted[:]
+
+    # ----------------------------------------------------------------
+
+    def simulate(self, para, tend=None):
+
+        """ This method simulates the model (see the simulate method of the model)."""
+
+        rhscount = self.profiler.counters.get('rhs evaluations', 0)
+        start = time.perf_counter()
+        self.instrument(self.model, set())
+        try:
+            if self.hastend:
+                simdata = self.model.simulate(para, tend=tend)
+            else:
+                simdata = self.model.simulate(para)
+        finally:
+            self.detach()
+        self.profiler.addtime('simulate', time.perf_counter() - start)
+
+        self.profiler.count('simulations')
+        self.profiler.count('simulated days', simdata.shape[0])  # One column per gauge, if any
+        if self.profiler.counters.get('rhs evaluations', 0) == rhscount:
+            self.profiler.count('simulations without rhs evaluations')
+
+        return simdata
+
+    # ----------------------------------------------------------------
+
+    def profiled_batch(self, param_matrix, tend=None):
+
+        """ This method is used as the 'simulate_batch' method (see ExphydroModel)."""
+
+        rhscount = self.profiler.counters.get('rhs evaluations', 0)
+        start = time.perf_counter()
+        self.instrument(self.model, set())
+        try:
+            simbatch = self.model.simulate_batch(param_matrix, tend=tend)
+        finally:
+            self.detach()
+        self.profiler.addtime('simulate_batch', time.perf_counter() - start)
+
+        self.profiler.count('simulations', simbatch.shape[0])
+        self.profiler.count('simulated days', simbatch.shape[0]*simbatch.shape[1])
+        if self.profiler.counters.get('rhs evaluations', 0) == rhscount:
+            self.profiler.count('simulations without rhs evaluations', simbatch.shape[0])
+
+        return simbatch
+
+######################################################################
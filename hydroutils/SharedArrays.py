@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import sys
+import copy
+import weakref
+from scipy import sparse
+from multiprocessing import shared_memory, resource_tracker
+
+
+######################################################################
+
+class SharedArray(numpy.ndarray):
+
+    """ The 'SharedArray' class is a NumPy array whose data is in a shared memory block
+    (see the SharedArrays class).
+
+    When a SharedArray (or a slice of it) is sent to a worker process, only the name of
+    the shared memory block and the position of the data in it are pickled.  The worker
+    process then attaches a view of the same memory instead of receiving a copy of the data.
+    """
+
+    # Shared memory blocks attached by this process, by name
+    attached = {}
+
+    def __array_finalize__(self, obj):
+
+        self.shmname = getattr(obj, 'shmname', None)  # Name of the shared memory block
+        self.shmaddr = getattr(obj, 'shmaddr', 0)  # Memory address of the shared memory block
+        self.shmsize = getattr(obj, 'shmsize', 0)  # Size of the shared memory block (bytes)
+
+    # ----------------------------------------------------------------
+
+    def __reduce_ex__(self, protocol):
+
+        addr = self.__array_interface__['data'][0]
+        offset = addr - self.shmaddr
+
+        # Arrays calculated from a SharedArray are not in the shared memory block,
+        # so they are pickled as normal arrays
+        span = numpy.sum((numpy.array(self.shape) - 1)*numpy.abs(self.strides)) + self.itemsize
+        if self.shmname is None or self.size == 0 or offset < 0 or offset + span > self.shmsize:
+            return numpy.asarray(self).__reduce_ex__(protocol)
+
+        return (SharedArray.attach, (self.shmname, self.shape, self.dtype.str, offset, self.strides))
+
+    # ----------------------------------------------------------------
+
+    def __deepcopy__(self, memo):
+
+        # A deep copy is a normal array with its own data
+        return numpy.array(self)
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def attach(name, shape, dtype, offset, strides):
+
+        """ This method returns a view of the data in a shared memory block.
+        The shared memory block is opened only once by each process.
+        """
+
+        shm = SharedArray.attached.get(name)
+        if shm is None:
+            if sys.version_info >= (3, 13):
+                shm = shared_memory.SharedMemory(name=name, track=False)
+            else:
+                # Only the process that created the block may unlink it
+                register = resource_tracker.register
+                resource_tracker.register = lambda *args: None
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                finally:
+                    resource_tracker.register = register
+            SharedArray.attached[name] = shm
+
+        array = SharedArray.view(shm, shape, dtype, offset, strides)
+        array.flags.writeable = False
+
+        return array
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def view(shm, shape, dtype, offset=0, strides=None):
+
+        """ This method returns a SharedArray view of the data in a shared memory block."""
+
+        array = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset,
+                              strides=strides).view(SharedArray)
+        array.shmname = shm.name
+        array.shmaddr = array.__array_interface__['data'][0] - offset
+        array.shmsize = shm.size
+
+        return array
+
+######################################################################
+
+
+class SharedArrays(object):
+
+    """ The 'SharedArrays' class places NumPy arrays (e.g., climate inputs and observed data)
+    in shared memory, so that worker processes use them without copies (see SharedArray).
+
+    The shared memory blocks are unlinked when the close method is called, when the instance
+    is used as a context manager and the 'with' block ends, or when the program exits.  If the
+    program crashes, the resource tracker of the multiprocessing module unlinks them.
+
+    Example:
+        with SharedArrays() as shared, ProcessPoolExecutor(4) as pool:
+            model = shared.shareobject(model)  # Climate inputs (and other large arrays) of the model
+            obsdata = shared.share(obsdata)
+            ...
+    """
+
+    def __init__(self):
+
+        """ This method is used to create an instance of the SharedArrays class.
+
+        Syntax: SharedArrays()
+        """
+
+        self.blocks = []  # Shared memory blocks created by this instance
+
+        # Unlink the shared memory blocks at the latest when the program exits
+        self.finalizer = weakref.finalize(self, SharedArrays.release, self.blocks)
+
+    # ----------------------------------------------------------------
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ----------------------------------------------------------------
+
+    @staticmethod
+    def release(blocks):
+
+        """ This method closes and unlinks shared memory blocks."""
+
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                # Arrays still use the memory, which is freed when they are deleted
+                pass
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        del blocks[:]
+
+    # ----------------------------------------------------------------
+
+    def close(self):
+
+        """ This method unlinks all shared memory blocks created by this instance."""
+
+        self.finalizer()
+
+    # ----------------------------------------------------------------
+
+    def share(self, array):
+
+        """ This method copies an array into a new shared memory block
+        and returns a read-only SharedArray view of it.  The arrays of a
+        scipy.sparse matrix are shared in a copy of the matrix (in CSR format).
+        """
+
+        if sparse.issparse(array):
+            shared = copy.copy(sparse.csr_matrix(array))
+            shared.data = self.share(shared.data)
+            shared.indices = self.share(shared.indices)
+            shared.indptr = self.share(shared.indptr)
+            return shared
+
+        array = numpy.asanyarray(array)
+        if isinstance(array, SharedArray) and array.shmname is not None:
+            return array
+
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.blocks.append(shm)
+
+        shared = SharedArray.view(shm, array.shape, array.dtype)
+        shared[...] = array
+        shared.flags.writeable = False  # All processes see the same data
+
+        return shared
+
+    # ----------------------------------------------------------------
+
+    def shareobject(self, obj, attributes=None):
+
+        """ This method returns a copy of an object (e.g., a model) in which the arrays
+        of the given attributes are placed in shared memory.
+
+        Args:
+            (1) obj: Object containing the arrays, e.g., an instance of ExphydroModel.
+
+            (2) attributes: (Optional) Names of the attributes that are shared. The attributes of
+                            the objects that obj contains (e.g., the lumped model of a distributed
+                            model) are also searched.  By default, each object shares the attributes
+                            named in the 'sharedattributes' attribute of its class, e.g., the climate
+                            inputs of ExphydroModel and the weights and streamflow of the pixels of
+                            ExphydroDistrEngine.
+
+        The shared arrays are read-only, so only the arrays that a model reads (or replaces with new
+        arrays) during a simulation can be shared, not those it writes into.  The other attributes
+        are not copied, i.e., the copy of obj refers to the same values as obj.  The original
+        object is not changed.
+        """
+
+        new = copy.copy(obj)
+        names = getattr(type(obj), 'sharedattributes', ()) if attributes is None else attributes
+
+        for key, item in vars(obj).items():
+            if key in names and (isinstance(item, numpy.ndarray) or sparse.issparse(item)):
+                setattr(new, key, self.share(item))
+            elif hasattr(item, '__dict__') and type(item).__module__ != 'builtins' and not isinstance(item, type):
+                setattr(new, key, self.shareobject(item, attributes))
+
+        return new
+
+######################################################################
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import inspect
+from collections import OrderedDict
+from .DiskCache import DiskCache
+
+
+######################################################################
+
+class SimulationCache(object):
+
+    """ The 'SimulationCache' class keeps the simulated time-series of a model in memory,
+    so that a parameter set that has already been simulated is not simulated again.
+
+    It wraps a model and can be used instead of it (e.g., in the Calibration methods).
+    The parameter values are rounded to a given number of decimals before they are
+    compared, so that nearly identical parameter sets share one simulation.  When the
+    cached time-series exceed the memory budget, the least recently used ones are removed.
+
+    The cache keys also contain a hash of the model (as for DiskCache): its climate inputs,
+    initial state, ODE solver and settings of a distributed model (e.g., pixel weights and
+    floating point type).  A simulation is therefore not
+    taken from the cache after the model is changed, e.g., with setstate, advance or
+    appendinputs.  The climate inputs are only hashed again when they are replaced by
+    other arrays, so they must not be changed in place.
+
+    A simulation taken from the cache does not change the wrapped model, i.e., its
+    state and fluxes are those of the last simulation that was actually run.
+    """
+
+    def __init__(self, model, maxbytes=256*2**20, decimals=None):
+
+        """ This method is used to create an instance of the SimulationCache class.
+
+        Syntax: SimulationCache(model, maxbytes, decimals)
+
+        Args:
+            (1) model: Instance of the user provided model. The class file of user's model MUST
+            contain a method called 'simulate', and the parameter sets MUST contain a method called
+            'getvalues' (see ExphydroParameters).  If the model also contains the method
+            'simulate_batch', it is cached as well.
+
+            (2) maxbytes: (Optional) Memory budget of the cached time-series (bytes).
+
+            (3) decimals: (Optional) No. of decimals to which parameter values are rounded
+                          before they are compared. By default they must be identical.
+        """
+
+        self.model = model
+        self.maxbytes = maxbytes
+        self.decimals = decimals
+
+        self.cache = OrderedDict()  # Simulated time-series, from the least to the most recently used
+        self.nbytes = 0  # Memory used by the cached time-series (bytes)
+        self.hits = 0  # No. of simulations taken from the cache
+        self.misses = 0  # No. of simulations that were run
+        self.evictions = 0  # No. of time-series removed from the cache
+
+        # Climate inputs of the model and their hash (see DiskCache.hashinputs)
+        self.inputhash = None
+
+        # Only pass the 'tend' argument to the methods that accept it
+        self.hastend = 'tend' in inspect.signature(model.simulate).parameters
+
+        if hasattr(model, 'simulate_batch'):
+            self.simulate_batch = self.cached_batch
+
+    # ----------------------------------------------------------------
+
+    def __getattr__(self, name):
+
+        # All other attributes are those of the wrapped model
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    # ----------------------------------------------------------------
+
+    def modelkey(self):
+
+        """ This method returns the hash of the climate inputs, initial state,
+        ODE solver and other settings of the model (see DiskCache.settings).
+        """
+
+        self.inputhash = DiskCache.hashinputs(self.model, self.inputhash)
+
+        return self.inputhash[1] + DiskCache.hashattributes(self.model, DiskCache.settings)
+
+    # ----------------------------------------------------------------
+
+    def key(self, values, tend, modelkey):
+
+        """ This method returns the cache key of a parameter set."""
+
+        values = numpy.asarray(values, dtype=float)
+        if self.decimals is not None:
+            values = numpy.round(values, self.decimals)
+
+        # Adding zero turns -0.0 into 0.0
+        return modelkey, (values + 0.0).tobytes(), tend
+
+    # ----------------------------------------------------------------
+
+    def lookup(self, key):
+
+        """ This method returns the cached time-series of a key, or None."""
+
+        simdata = self.cache.get(key)
+        if simdata is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.cache.move_to_end(key)
+
+        return simdata
+
+    # ----------------------------------------------------------------
+
+    def store(self, key, simdata):
+
+        """ This method adds a time-series to the cache and removes the least
+        recently used time-series if the memory budget is exceeded.
+        """
+
+        simdata = numpy.array(simdata)
+        if simdata.nbytes > self.maxbytes:
+            return
+
+        simdata.flags.writeable = False
+        self.cache[key] = simdata
+        self.nbytes += simdata.nbytes
+
+        while self.nbytes > self.maxbytes:
+            _, old = self.cache.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+
+    # ----------------------------------------------------------------
+
+    def clear(self):
+
+        """ This method removes all time-series from the cache."""
+
+        self.cache.clear()
+        self.nbytes = 0
+
+    # ----------------------------------------------------------------
+
+    def stats(self):
+
+        """ This method returns the cache statistics as a dictionary."""
+
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.cache), 'nbytes': self.nbytes}
+
+    # ----------------------------------------------------------------
+
+    def simulate(self, para, tend=None):
+
+        """ This method returns the simulated time-series of a parameter set from the cache,
+        or simulates the model (see the simulate method of the model).  The returned array
+        is read-only.
+        """
+
+        key = self.key(para.getvalues(), tend, self.modelkey())
+        simdata = self.lookup(key)
+
+        if simdata is None:
+            if self.hastend:
+                simdata = self.model.simulate(para, tend=tend)
+            else:
+                simdata = self.model.simulate(para)
+            self.store(key, simdata)
+            simdata = self.cache.get(key, simdata)
+
+        return simdata
+
+    # ----------------------------------------------------------------
+
+    def cached_batch(self, param_matrix, tend=None):
+
+        """ This method is used as the 'simulate_batch' method (see ExphydroModel).
+        Only the parameter sets that are not in the cache are simulated, with one call
+        to the 'simulate_batch' method of the model.
+        """
+
+        param_matrix = numpy.atleast_2d(numpy.asarray(param_matrix, dtype=float))
+        modelkey = self.modelkey()
+        keys = [self.key(values, tend, modelkey) for values in param_matrix]
+        simlist = [self.lookup(key) for key in keys]
+
+        missing = [i for i in range(len(keys)) if simlist[i] is None]
+        if missing:
+            simbatch = self.model.simulate_batch(param_matrix[missing], tend=tend)
+            for j, i in enumerate(missing):
+                simlist[i] = simbatch[j]
+                self.store(keys[i], simbatch[j])
+
+        return numpy.array(simlist)
+
+######################################################################
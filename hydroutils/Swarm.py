@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+# This file is part of the 'hydroutils' package.
+
+import numpy
+import copy
+
+
+######################################################################
+
+class Swarm(object):
+
+    """ The 'Swarm' class holds a particle swarm of the PSO algorithm as arrays.
+
+    Each row of the (npart, nparams) arrays is one particle (i.e., one parameter set)
+    and each column is one parameter.  The swarm is created from a list of parameter set
+    objects, which must contain the methods 'getvalues', 'setvalues' and 'getbounds'
+    (see ExphydroParameters), and the parameter values can be written back into them.
+    If the parameter set objects also contain the methods 'getvelocities' and 'setvelocities',
+    the parameter velocities are read from them and written back with the values.
+    """
+
+    def __init__(self, params):
+
+        """ This method is used to create an instance of the Swarm class.
+
+        Syntax: Swarm(params)
+
+        Args:
+            (1) params: List of the instances of user provided model parameter sets.
+        """
+
+        self.params = params  # Parameter set objects of the particles
+        self.npart = len(params)  # No. of particles in the swarm
+
+        self.position = numpy.array([para.getvalues() for para in params])  # Parameter values
+        if hasattr(params[0], 'getvelocities'):
+            self.velocity = numpy.array([para.getvelocities() for para in params], dtype=float)  # Parameter velocities
+        else:
+            self.velocity = numpy.zeros(self.position.shape)
+        bounds = [para.getbounds() for para in params]
+        self.lb = numpy.array([b[0] for b in bounds])  # Lower bounds of the parameters
+        self.ub = numpy.array([b[1] for b in bounds])  # Upper bounds of the parameters
+        self.objval = numpy.array([para.objval for para in params], dtype=float)  # Objective function values
+
+        # Personal best of each particle
+        self.pbest = self.position.copy()
+        self.pbestval = self.objval.copy()
+
+        # Global best of the swarm
+        self.gbest = self.position[0].copy()
+        self.gbestval = self.objval[0]
+
+    # ----------------------------------------------------------------
+
+    def updatebest(self, index=slice(None)):
+
+        """ This method updates the personal best of each particle and the global best of
+        the swarm from the objective function values of the current particle positions.
+
+        Args:
+            (1) index: (Optional) Index value(s) of the particles that have been evaluated.
+                       By default all particles are updated.
+        """
+
+        index = numpy.atleast_1d(numpy.arange(self.npart)[index])
+
+        # Particles that have improved upon their own best objective function
+        improved = index[self.objval[index] > self.pbestval[index]]
+        self.pbest[improved] = self.position[improved]
+        self.pbestval[improved] = self.objval[improved]
+
+        # If any particle has improved upon entire swarm's objective function,
+        # the first of the best particles becomes the global best
+        improved = self.objval[index] > self.gbestval
+        if improved.any():
+            i = index[numpy.argmax(numpy.where(improved, self.objval[index], -numpy.inf))]
+            self.gbest = self.position[i].copy()
+            self.gbestval = self.objval[i]
+
+    # ----------------------------------------------------------------
+
+    def updatepositions(self, w, index=slice(None)):
+
+        """ This method moves all particles of the swarm, i.e., it updates the velocity
+        and then the value of every parameter (see the Parameter class).
+
+        Args:
+            (1) w: Inertia weight of the PSO algorithm.
+
+            (2) index: (Optional) Index value(s) of the particles to move. By default all particles are moved.
+        """
+
+        position = self.position[index]
+        velocity = self.velocity[index]
+        lb = self.lb[index]
+        ub = self.ub[index]
+
+        x = numpy.random.uniform(0, 1, position.shape)
+        y = numpy.random.uniform(0, 1, position.shape)
+        c1 = 2
+        c2 = 2
+        sf = 0.9  # This is a safety factor
+
+        # Update the parameter velocities
+        velocity = (w*velocity + c1*x*(self.pbest[index] - position) +
+                    c2*y*(self.gbest - position))
+
+        # Keep the parameters within their bounds
+        velocity = numpy.where(position + velocity < lb, sf*(lb - position), velocity)
+        velocity = numpy.where(position + velocity > ub, sf*(ub - position), velocity)
+
+        # Update the parameter values
+        self.velocity[index] = velocity
+        self.position[index] = position + velocity
+
+    # ----------------------------------------------------------------
+
+    def getstate(self):
+
+        """ This method returns the arrays that describe the state of the swarm as a
+        dictionary, e.g., to write a checkpoint of an optimisation (see Calibration.pso_maximise).
+        """
+
+        return {'position': self.position.copy(), 'velocity': self.velocity.copy(), 'objval': self.objval.copy(),
+                'pbest': self.pbest.copy(), 'pbestval': self.pbestval.copy(), 'gbest': self.gbest.copy(),
+                'gbestval': numpy.float64(self.gbestval)}
+
+    # ----------------------------------------------------------------
+
+    def setstate(self, state):
+
+        """ This method restores a state of the swarm that was returned by getstate."""
+
+        if numpy.shape(state['position']) != self.position.shape:
+            raise ValueError('The state has %s parameter values, but the swarm has %s'
+                             % (numpy.shape(state['position']), self.position.shape))
+
+        self.position = numpy.array(state['position'], dtype=float)
+        self.velocity = numpy.array(state['velocity'], dtype=float)
+        self.objval = numpy.array(state['objval'], dtype=float)
+        self.pbest = numpy.array(state['pbest'], dtype=float)
+        self.pbestval = numpy.array(state['pbestval'], dtype=float)
+        self.gbest = numpy.array(state['gbest'], dtype=float)
+        self.gbestval = numpy.float64(state['gbestval'])
+
+    # ----------------------------------------------------------------
+
+    def writeparams(self, index=slice(None)):
+
+        """ This method writes the current particle positions (and velocities)
+        into the parameter set objects of the swarm.
+
+        Args:
+            (1) index: (Optional) Index value(s) of the particles to write. By default all particles are written.
+        """
+
+        setvelocities = hasattr(self.params[0], 'setvelocities')
+        for i in numpy.atleast_1d(numpy.arange(self.npart)[index]):
+            self.params[i].setvalues(self.position[i])
+            if setvelocities:
+                self.params[i].setvelocities(self.velocity[i])
+
+    # ----------------------------------------------------------------
+
+    def getbest(self):
+
+        """ This method returns the global best of the swarm as a new parameter set object."""
+
+        para = copy.deepcopy(self.params[0])
+        para.setvalues(self.gbest)
+        para.objval = self.gbestval
+
+        return para
+
+######################################################################
@@ -5,6 +5,14 @@
 
 from .Parameter import Parameter
 from .ObjectiveFunction import ObjectiveFunction
+from .PreparedObjective import PreparedObjective
+from .MultiGaugeObjective import MultiGaugeObjective, PreparedMultiGauge
+from .SharedArrays import SharedArray, SharedArrays
+from .SimulationCache import SimulationCache
+from .DiskCache import DiskCache
+from .Profiler import Profiler, ProfiledModel, ProgressPrinter
+from .Swarm import Swarm
 from .Calibration import Calibration
 from .OdeSolver import OdeSolver
 from .Daily2monthly import Daily2monthly
+from .ForcingData import ForcingData
@@ -7,6 +7,7 @@ setup(name='exphydro',
       license='MIT',
       packages=['exphydro'],
       install_requires=['numpy', 'scipy', 'matplotlib', 'hydroutils'],
+      extras_require={'numba': ['numba']},
       dependency_links=['https://github.com/sopanpatil/hydroutils/tarball/master#egg=hydroutils-1.1'],
       classifiers=[
           'Programming Language :: Python :: 3.7',
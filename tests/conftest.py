@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Shared fixtures of the regression tests. The tests compare the fast code paths
+(e.g., batched, compiled, chunked and resumed simulations) with the reference
+simulation of the lumped EXP-HYDRO model on the data in the SampleData folder.
+"""
+
+import numpy
+import os
+import sys
+import pytest
+
+# Make the packages of this repository importable without installing them
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOTDIR)
+
+# No. of days of the sample data used by the tests (three years, to keep the tests fast)
+NDAYS = 1096
+
+
+@pytest.fixture(scope='session')
+def sampledata():
+
+    """ This fixture returns the first NDAYS days of the precipitation, potential
+    evapotranspiration, air temperature and observed streamflow in the SampleData folder.
+    The text files are read directly, so that no cache files are written next to them.
+    """
+
+    datadir = os.path.join(ROOTDIR, 'SampleData')
+    names = ('P_test.txt', 'PET_test.txt', 'T_test.txt', 'Q_test.txt')
+
+    return tuple(numpy.genfromtxt(os.path.join(datadir, name))[:NDAYS] for name in names)
+
+
+@pytest.fixture
+def paramsets():
+
+    """ This fixture returns a few random EXP-HYDRO parameter sets (with a fixed seed)."""
+
+    from exphydro.lumped import ExphydroParameters
+
+    numpy.random.seed(7)
+    return [ExphydroParameters() for i in range(4)]
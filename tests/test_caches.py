@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Regression tests of the simulation caches."""
+
+import numpy
+import os
+from exphydro.lumped import ExphydroModel, ExphydroParameters
+from exphydro.distributed import ExphydroDistrParameters, type3
+from hydroutils import Calibration, DiskCache, ObjectiveFunction, SimulationCache
+
+
+def test_simulationcache_follows_the_model(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    para = paramsets[0]
+    cache = SimulationCache(ExphydroModel(p[:500], pet[:500], t[:500]))
+    reference = ExphydroModel(p[:500], pet[:500], t[:500])
+
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+    assert cache.hits == 1
+
+    # New climate inputs
+    numpy.testing.assert_array_equal(cache.advance(p[500:], pet[500:], t[500:]),
+                                     reference.advance(p[500:], pet[500:], t[500:]))
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+
+    # New initial state
+    model = ExphydroModel(p, pet, t)
+    model.simulate(para)
+    cache.setstate(model.getstate(day=200))
+    reference.setstate(model.getstate(day=200))
+    cache.appendinputs(p[201:], pet[201:], t[201:])
+    reference.appendinputs(p[201:], pet[201:], t[201:])
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+
+    # Other ODE solver
+    cache.model.solver = 'rk45'
+    reference.solver = 'rk45'
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+    assert cache.hits == 1
+
+
+def test_diskcache_follows_the_climate_inputs(sampledata, paramsets, tmp_path):
+
+    p, pet, t, qobs = sampledata
+    para = paramsets[0]
+    cache = DiskCache(ExphydroModel(p[:500], pet[:500], t[:500]), str(tmp_path))
+    reference = ExphydroModel(p[:500], pet[:500], t[:500])
+
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+    cache.appendinputs(p[500:], pet[500:], t[500:])
+    reference.appendinputs(p[500:], pet[500:], t[500:])
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+    numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_caches_follow_the_floating_point_type(sampledata, tmp_path):
+
+    p, pet, t, qobs = sampledata
+    numpy.random.seed(9)
+    para = ExphydroDistrParameters(3)
+    modelkeys = []
+
+    for dtype in (None, numpy.float32):
+        model = type3.ExphydroDistrModel(p, pet, t, 3, numpy.full(3, 1.0/3), dtype=dtype)
+        reference = type3.ExphydroDistrModel(p, pet, t, 3, numpy.full(3, 1.0/3), dtype=dtype)
+        cache = DiskCache(model, str(tmp_path))
+
+        # The simulations of both floating point types are kept apart
+        numpy.testing.assert_array_equal(cache.simulate(para), reference.simulate(para))
+        assert (cache.hits, cache.misses) == (0, 1)
+        modelkeys.append(SimulationCache(model).modelkey())
+
+    assert modelkeys[0] != modelkeys[1]
+
+
+def test_calibration_through_the_diskcache(sampledata, tmp_path):
+
+    p, pet, t, qobs = sampledata
+    calperiods = [365, 1000]
+
+    def calibrate(model):
+        numpy.random.seed(1)
+        params = [ExphydroParameters() for i in range(6)]
+        numpy.random.seed(5)
+        return Calibration.pso_maximise(model, params, qobs, ObjectiveFunction.klinggupta, calperiods, calperiods)
+
+    reference = calibrate(ExphydroModel(p, pet, t))
+
+    # The swarm is simulated with the 'simulate_batch' method of the cache
+    cache = DiskCache(ExphydroModel(p, pet, t), str(tmp_path))
+    assert calibrate(cache).objval == reference.objval
+    assert cache.misses > 0
+
+    # A second calibration reads all simulations from the cache files
+    hits, misses = cache.hits, cache.misses
+    assert calibrate(cache).objval == reference.objval
+    assert (cache.hits, cache.misses) == (2*hits + misses, misses)
+
+
+def test_diskcache_size_limit(sampledata, paramsets, tmp_path, monkeypatch):
+
+    p, pet, t, qobs = sampledata
+    filesize = DiskCache(ExphydroModel(p, pet, t), str(tmp_path / 'one'))
+    filesize.simulate(paramsets[0])
+    cache = DiskCache(ExphydroModel(p, pet, t), str(tmp_path / 'all'), maxbytes=2.5*filesize.nbytes)
+
+    # The directory is scanned at the first write and when the size limit is exceeded
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+
+    for para in paramsets:
+        cache.simulate(para)
+
+    assert len(scans) == 3
+    assert len(os.listdir(str(tmp_path / 'all'))) == 2
+    assert cache.nbytes == 2*filesize.nbytes
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Regression tests of the calibration methods."""
+
+import numpy
+import pytest
+from scipy import stats
+from concurrent.futures import ProcessPoolExecutor
+from exphydro.lumped import ExphydroModel, ExphydroParameters
+from hydroutils import Calibration, ObjectiveFunction, PreparedObjective, SimulationCache
+
+CALPERIODS = [365, 1000]
+
+
+def test_screening_keeps_the_ranking(sampledata):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    objf = PreparedObjective(ObjectiveFunction.nashsutcliffe, qobs, CALPERIODS)
+
+    numpy.random.seed(2)
+    params = [ExphydroParameters() for i in range(100)]
+    values = numpy.array([para.getvalues() for para in params])
+    objvals = objf(model.simulate_batch(values, tend=CALPERIODS[1])[:, CALPERIODS[0]:CALPERIODS[1]+1])
+
+    paramsmax, results = Calibration.montecarlo_screened(model, None, params, qobs, ObjectiveFunction.nashsutcliffe,
+                                                         CALPERIODS, CALPERIODS, fraction=0.1, callback=None)
+
+    assert stats.spearmanr(results['screenvals'], objvals)[0] > 0.9
+    assert paramsmax.objval == numpy.max(objvals)
+
+
+def test_screening_with_one_screening_period(sampledata):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    numpy.random.seed(2)
+    params = [ExphydroParameters() for i in range(10)]
+
+    # The simulated data start 100 days after the observed data
+    calperiods_sim = [CALPERIODS[0] + 100, CALPERIODS[1]]
+    calperiods_obs = [CALPERIODS[0], CALPERIODS[1] - 100]
+    results = [Calibration.montecarlo_screened(model, None, params, qobs[100:], ObjectiveFunction.klinggupta,
+                                               calperiods_obs, calperiods_sim, fraction=0.5,
+                                               **periods)[1]['screenvals']
+               for periods in ({'screenperiods_obs': [365, 500], 'screenperiods_sim': [465, 600]},
+                               {'screenperiods_obs': [365, 500]}, {'screenperiods_sim': [465, 600]})]
+
+    numpy.testing.assert_array_equal(results[1], results[0])
+    numpy.testing.assert_array_equal(results[2], results[0])
+
+
+class Interruption(Exception):
+    pass
+
+
+def test_checkpoint_resume_equals_uninterrupted_run(sampledata, tmp_path):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    checkpoint = str(tmp_path / 'pso.npz')
+
+    def calibrate(callback=None, checkpoint=None):
+        numpy.random.seed(1)
+        params = [ExphydroParameters() for i in range(10)]
+        numpy.random.seed(5)
+        paramsmax = Calibration.pso_maximise(model, params, qobs, ObjectiveFunction.klinggupta, CALPERIODS,
+                                             CALPERIODS, callback=callback, checkpoint=checkpoint)
+        return paramsmax, numpy.random.random()
+
+    def interrupt(info):
+        if info['iteration'] == 4:
+            raise Interruption
+
+    paramsmax, nextrandom = calibrate()
+
+    with pytest.raises(Interruption):
+        calibrate(interrupt, checkpoint)
+    resumed, resumedrandom = calibrate(None, checkpoint)
+
+    assert resumed.objval == paramsmax.objval
+    numpy.testing.assert_array_equal(resumed.getvalues(), paramsmax.getvalues())
+    # The random number generator continues as after the uninterrupted run
+    assert resumedrandom == nextrandom
+
+
+class CountingExecutor(ProcessPoolExecutor):
+
+    """ Process pool that records the largest no. of tasks that were submitted but not finished."""
+
+    def __init__(self, *args, **kwargs):
+        ProcessPoolExecutor.__init__(self, *args, **kwargs)
+        self.futures = []
+        self.maxpending = 0
+
+    def submit(self, *args, **kwargs):
+        future = ProcessPoolExecutor.submit(self, *args, **kwargs)
+        self.futures.append(future)
+        self.maxpending = max(self.maxpending, sum(not f.done() for f in self.futures))
+        return future
+
+
+def test_montecarlo_stream_with_executor(sampledata):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    kwargs = dict(chunksize=10, topk=3, seed=11)
+
+    paramsbest = Calibration.montecarlo_stream(model, ExphydroParameters(), 120, qobs,
+                                               ObjectiveFunction.nashsutcliffe, CALPERIODS, CALPERIODS, **kwargs)
+
+    with CountingExecutor(2) as executor:
+        parallelbest = Calibration.montecarlo_stream(model, ExphydroParameters(), 120, qobs,
+                                                     ObjectiveFunction.nashsutcliffe, CALPERIODS, CALPERIODS,
+                                                     executor=executor, n_workers=2, **kwargs)
+
+    # At most two chunks per worker are submitted at a time
+    assert len(executor.futures) == 12
+    assert executor.maxpending <= 4
+    assert [para.objval for para in parallelbest] == [para.objval for para in paramsbest]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Regression tests of the distributed EXP-HYDRO models."""
+
+import numpy
+import pickle
+import pytest
+from scipy import sparse
+from hydroutils import Calibration, MultiGaugeObjective, ObjectiveFunction, SharedArrays
+from exphydro.distributed import ExphydroDistrParameters
+from exphydro.distributed import type1, type2, type3, type4
+
+NPIXELS = 7
+
+
+def distributed_models(sampledata, **kwargs):
+
+    """ This function returns an instance of each type of distributed model."""
+
+    p, pet, t, qobs = sampledata
+    # Each pixel (or sub-catchment) has its own climate inputs for types 2 and 4
+    scale = numpy.linspace(0.8, 1.2, NPIXELS)
+    p2, pet2, t2 = numpy.outer(p, scale), numpy.outer(pet, scale), t[:, numpy.newaxis] + numpy.log(scale)
+    weights = numpy.linspace(1.0, 2.0, NPIXELS)/numpy.sum(numpy.linspace(1.0, 2.0, NPIXELS))
+
+    return {'type1': type1.ExphydroDistrModel(p, pet, t, NPIXELS, **kwargs),
+            'type2': type2.ExphydroDistrModel(p2, pet2, t2, NPIXELS, **kwargs),
+            'type3': type3.ExphydroDistrModel(p, pet, t, NPIXELS, weights, **kwargs),
+            'type4': type4.ExphydroDistrModel(p2, pet2, t2, NPIXELS, weights, **kwargs)}
+
+
+@pytest.mark.parametrize('name', ['type1', 'type2', 'type3', 'type4'])
+def test_chunked_equals_unchunked(sampledata, name):
+
+    numpy.random.seed(8)
+    para = ExphydroDistrParameters(NPIXELS)
+
+    model = distributed_models(sampledata)[name]
+    qsim = model.simulate(para).copy()
+
+    for chunksize in (3, NPIXELS):
+        chunked = distributed_models(sampledata, chunksize=chunksize)[name]
+        numpy.testing.assert_allclose(chunked.simulate(para), qsim, rtol=1e-12, atol=1e-12)
+
+        # Summary of the streamflow of each pixel
+        numpy.testing.assert_allclose(chunked.pixelsummary['qmean'], numpy.mean(model.qsimpixels, axis=1),
+                                      rtol=1e-12)
+        numpy.testing.assert_allclose(chunked.pixelsummary['qmax'], numpy.max(model.qsimpixels, axis=1),
+                                      rtol=1e-12)
+
+
+def test_shared_model_pickles_small(sampledata):
+
+    numpy.random.seed(8)
+    para = ExphydroDistrParameters(NPIXELS)
+    model = distributed_models(sampledata)['type3']
+    qsim = model.simulate(para).copy()
+
+    with SharedArrays() as shared:
+        sharedmodel = shared.shareobject(model)
+        # The climate inputs and the streamflow of the pixels are not pickled
+        assert len(pickle.dumps(sharedmodel)) < len(pickle.dumps(model))/4
+        numpy.testing.assert_array_equal(pickle.loads(pickle.dumps(sharedmodel)).simulate(para), qsim)
+
+        # Sparse routing matrix of the gauges
+        p, pet, t, qobs = sampledata
+        routing = sparse.csr_matrix(numpy.vstack([numpy.ones(NPIXELS), numpy.arange(NPIXELS) < 3])/NPIXELS)
+        model = type3.ExphydroDistrModel(p, pet, t, NPIXELS, routing)
+        sharedmodel = pickle.loads(pickle.dumps(shared.shareobject(model)))
+        numpy.testing.assert_array_equal(sharedmodel.simulate(para), model.simulate(para))
+
+
+def test_several_gauges(sampledata):
+
+    p, pet, t, qobs = sampledata
+    routing = numpy.vstack([numpy.ones(NPIXELS), numpy.arange(NPIXELS) < 3])
+    routing = routing/routing.sum(axis=1, keepdims=True)
+    model = type3.ExphydroDistrModel(p, pet, t, NPIXELS, numpy.full(NPIXELS, 1.0/NPIXELS), gaugewts=routing)
+    obsdata = numpy.column_stack([qobs, 0.8*qobs])
+    calperiods = [365, 1000]
+
+    numpy.random.seed(8)
+    para = ExphydroDistrParameters(NPIXELS)
+    objval = Calibration.evaluate(model, para, obsdata, MultiGaugeObjective(ObjectiveFunction.nashsutcliffe),
+                                  calperiods, calperiods)
+
+    # The streamflow at each gauge is the routed streamflow of the pixels
+    qsim = routing.dot(model.qsimpixels).T
+    pergauge = [ObjectiveFunction.nashsutcliffe(obsdata[365:1001, g], qsim[365:1001, g]) for g in range(2)]
+    assert objval == pytest.approx(numpy.mean(pergauge), rel=1e-12)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Tests of the binary cache of the forcing text files."""
+
+import os
+import numpy
+from hydroutils import ForcingData
+
+
+def test_files_with_different_extensions_have_their_own_cache(tmp_path):
+
+    txtfile = tmp_path / 'P_test.txt'
+    csvfile = tmp_path / 'P_test.csv'
+    numpy.savetxt(txtfile, numpy.arange(5.0))
+    numpy.savetxt(csvfile, numpy.arange(5.0) + 10.0)
+
+    assert ForcingData.cachefiles(str(txtfile)) != ForcingData.cachefiles(str(csvfile))
+
+    for repeat in range(2):
+        numpy.testing.assert_array_equal(ForcingData.load(str(txtfile)), numpy.arange(5.0))
+        numpy.testing.assert_array_equal(ForcingData.load(str(csvfile)), numpy.arange(5.0) + 10.0)
+
+
+def test_cache_with_a_mismatched_npy_file_is_rebuilt(tmp_path):
+
+    txtfile = tmp_path / 'P_test.txt'
+    numpy.savetxt(txtfile, numpy.arange(5.0))
+    ForcingData.load(str(txtfile))
+    npyfile = ForcingData.cachefiles(str(txtfile))[0]
+
+    # Another process replaces the .npy file, but not (yet) its JSON file
+    with open(npyfile + '.other', 'wb') as fout:
+        numpy.save(fout, numpy.zeros(3))
+    os.replace(npyfile + '.other', npyfile)
+
+    numpy.testing.assert_array_equal(ForcingData.load(str(txtfile)), numpy.arange(5.0))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Regression tests of the lumped EXP-HYDRO model."""
+
+import numpy
+from exphydro.lumped import ExphydroModel
+
+
+def test_simulate_batch_equals_simulate(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+
+    qsim = [model.simulate(para).copy() for para in paramsets]
+    qbatch = model.simulate_batch(numpy.array([para.getvalues() for para in paramsets]))
+
+    assert qbatch.shape == (len(paramsets), p.shape[0])
+    numpy.testing.assert_allclose(qbatch, qsim, rtol=1e-12, atol=1e-12)
+
+
+def test_simulate_batch_single_row(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+
+    qsim = model.simulate(paramsets[0]).copy()
+    qbatch = model.simulate_batch(paramsets[0].getvalues())
+
+    numpy.testing.assert_allclose(qbatch[0], qsim, rtol=1e-12, atol=1e-12)
+
+
+def test_rk4_kernel_equals_rk4(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    kernelmodel = ExphydroModel(p, pet, t, solver='rk4_kernel')
+
+    for para in paramsets:
+        qsim = model.simulate(para).copy()
+        qkernel = kernelmodel.simulate(para).copy()
+
+        # Equal without Numba, and equal to floating point round-off with it
+        numpy.testing.assert_allclose(qkernel, qsim, rtol=1e-10, atol=1e-10)
+        numpy.testing.assert_allclose(kernelmodel.et, model.et, rtol=1e-10, atol=1e-10)
+        numpy.testing.assert_allclose(kernelmodel.melt, model.melt, rtol=1e-10, atol=1e-10)
+        numpy.testing.assert_allclose(kernelmodel.laststorage, model.laststorage, rtol=1e-10, atol=1e-10)
+
+
+def test_tend_equals_full_simulation(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    tend = 500
+
+    for solver in ExphydroModel.solvers:
+        model = ExphydroModel(p, pet, t, solver=solver)
+        qsim = model.simulate(paramsets[0]).copy()
+        qtend = model.simulate(paramsets[0], tend=tend)
+
+        assert qtend.shape == (tend + 1,)
+        numpy.testing.assert_array_equal(qtend, qsim[:tend+1])
+
+    model = ExphydroModel(p, pet, t)
+    param_matrix = numpy.array([para.getvalues() for para in paramsets])
+    qbatch = model.simulate_batch(param_matrix).copy()
+    numpy.testing.assert_array_equal(model.simulate_batch(param_matrix, tend=tend), qbatch[:, :tend+1])
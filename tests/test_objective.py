@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Tests of the prepared objective functions."""
+
+import numpy
+import pytest
+from hydroutils import ObjectiveFunction, PreparedObjective, MultiGaugeObjective
+
+
+@pytest.mark.parametrize('objf', [ObjectiveFunction.nashsutcliffe, ObjectiveFunction.klinggupta])
+def test_prepared_objective_equals_objectivefunction(objf):
+
+    rng = numpy.random.default_rng(3)
+    obsdata = rng.gamma(1.0, 2.0, 300)
+    simbatch = rng.gamma(1.0, 2.5, (5, 300))
+
+    prepared = PreparedObjective(objf, obsdata)
+    objvals = prepared(simbatch)
+
+    assert objvals.shape == (5,)
+    for i in range(5):
+        assert prepared(simbatch[i]) == pytest.approx(objf(obsdata, simbatch[i]), rel=1e-12)
+        assert objvals[i] == pytest.approx(objf(obsdata, simbatch[i]), rel=1e-12)
+
+
+def test_prepared_objective_with_missing_data():
+
+    rng = numpy.random.default_rng(4)
+    obsdata = rng.gamma(1.0, 2.0, 200)
+    obsdata[20:40] = numpy.nan
+    simdata = rng.gamma(1.0, 2.0, 200)
+
+    prepared = PreparedObjective(ObjectiveFunction.nashsutcliffe, obsdata)
+    mask = ~numpy.isnan(obsdata)
+
+    assert prepared(simdata) == pytest.approx(ObjectiveFunction.nashsutcliffe(obsdata[mask], simdata[mask]),
+                                              rel=1e-12)
+
+
+def test_multigauge_objective():
+
+    rng = numpy.random.default_rng(5)
+    obsdata = rng.gamma(1.0, 2.0, (300, 3))
+    obsdata[10:30, 1] = numpy.nan
+    simbatch = rng.gamma(1.0, 2.5, (4, 300, 3))
+
+    prepared = PreparedObjective.prepare(MultiGaugeObjective(ObjectiveFunction.klinggupta, weights=[2, 1, 1]), obsdata)
+    assert PreparedObjective.prepare(prepared, obsdata) is prepared
+
+    objvals = prepared(simbatch)
+    assert objvals.shape == (4,)
+    for i in range(4):
+        # Weighted mean of the values of all gauges, without the missing days of each gauge
+        pergauge = [ObjectiveFunction.klinggupta(obsdata[~numpy.isnan(obsdata[:, g]), g],
+                                                 simbatch[i, ~numpy.isnan(obsdata[:, g]), g]) for g in range(3)]
+        assert objvals[i] == pytest.approx(numpy.dot(pergauge, [0.5, 0.25, 0.25]), rel=1e-12)
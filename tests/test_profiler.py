@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Regression tests of the profiler."""
+
+import numpy
+import pytest
+from exphydro.lumped import ExphydroModel
+from hydroutils import Profiler
+
+
+def test_profiled_model_is_only_changed_during_a_call(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    model = ExphydroModel(p, pet, t)
+    reference = ExphydroModel(p, pet, t)
+    profiler = Profiler()
+    profiled = profiler.wrap(model)
+
+    numpy.testing.assert_array_equal(profiled.simulate(paramsets[0]), reference.simulate(paramsets[0]))
+    values = numpy.array([para.getvalues() for para in paramsets])
+    numpy.testing.assert_array_equal(profiled.simulate_batch(values), reference.simulate_batch(values))
+    assert 'waterbalance' not in vars(model) and 'waterbalance_batch' not in vars(model)
+    assert profiler.counters['simulations'] == 1 + len(paramsets)
+    assert profiler.counters['rhs evaluations'] > 0
+
+    # The right-hand side is also restored after an exception
+    with pytest.raises(AttributeError):
+        profiled.simulate(None)
+    assert 'waterbalance' not in vars(model)
+
+
+def test_profiled_kernel_simulations(sampledata, paramsets):
+
+    p, pet, t, qobs = sampledata
+    profiler = Profiler()
+    profiled = profiler.wrap(ExphydroModel(p, pet, t, solver='rk4_kernel'))
+    profiled.simulate(paramsets[0])
+
+    # The compiled kernel does not call the right-hand side methods of the model
+    assert profiler.counters['simulations without rhs evaluations'] == 1
+    assert 'rhs evaluations' not in profiler.counters
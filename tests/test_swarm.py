@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+# Programmer(s): Sopan Patil.
+
+""" Tests of the array-based PSO swarm."""
+
+import numpy
+from hydroutils import Swarm
+
+
+def test_writeparams_keeps_velocities(paramsets):
+
+    swarm = Swarm(paramsets)
+    numpy.testing.assert_array_equal(swarm.velocity, 0.0)
+
+    numpy.random.seed(1)
+    swarm.updatepositions(0.9)
+    swarm.writeparams()
+
+    for i, para in enumerate(paramsets):
+        numpy.testing.assert_array_equal(para.getvalues(), swarm.position[i])
+        numpy.testing.assert_array_equal(para.getvelocities(), swarm.velocity[i])
+        assert para.f.velocity == swarm.velocity[i, 0]
+
+    # A new swarm continues from the velocities of the parameter sets
+    numpy.testing.assert_array_equal(Swarm(paramsets).velocity, swarm.velocity)